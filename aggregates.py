@@ -0,0 +1,39 @@
+""" Monoids over items, for ThreeDeeBeeTree to keep per subtree. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+import operator
+from dataclasses import dataclass
+from math import inf
+from typing import Any, Callable
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """
+    A commutative monoid over items: lift maps an item to a value, combine
+    merges two values, and identity is the value of no items. The order in
+    which a subtree's values are combined is not fixed, so combine must be
+    associative and commutative.
+    """
+
+    lift: Callable[[Any], Any]
+    combine: Callable[[Any, Any], Any]
+    identity: Any
+
+    @staticmethod
+    def field(field: str | Callable[[Any], Any]) -> Callable[[Any], Any]:
+        """ Getter for an attribute name, or field itself if it is already a function. """
+        return operator.attrgetter(field) if isinstance(field, str) else field
+
+    @classmethod
+    def sum(cls, field: str | Callable[[Any], Any]) -> Aggregate:
+        return cls(cls.field(field), operator.add, 0)
+
+    @classmethod
+    def min(cls, field: str | Callable[[Any], Any]) -> Aggregate:
+        return cls(cls.field(field), min, inf)
+
+    @classmethod
+    def max(cls, field: str | Callable[[Any], Any]) -> Aggregate:
+        return cls(cls.field(field), max, -inf)
@@ -1,77 +1,270 @@
 from __future__ import annotations
-from threedeebeetree import Point
-from ratio import Percentiles
+from morton import Point
+from math import ceil
+from typing import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed by make_ordering_numpy
+    np = None
+
+BASE_CASE_SIZE = 17
+RATIO = (1 / 7) * 100
+PARALLEL_THRESHOLD = 20000
+
+
+def _octant_index(point, root):
+    """
+    This function returns the octant index of a point that
+    represents the region in which the point resides in a space.
+    If octant_index > 0, the point is in the positive half of the axis.
+
+    Time Complexity:
+    - Best case = Worst case: O(1)
+    """
+    octant_index = 0
+    if point[0] > root[0]:
+        octant_index += 1
+    if point[1] > root[1]:
+        octant_index += 2
+    if point[2] > root[2]:
+        octant_index += 4
+    return octant_index
+
+
+def _rank_bounds(size: int) -> tuple[int, int]:
+    """ The 0-based ranks kept by Percentiles.ratio(RATIO, RATIO) on size points. """
+    return ceil(size * RATIO / 100), size - ceil(size * RATIO / 100) - 1
+
+
+def sort_by_axis(points: list[Point], order: list[int]) -> list[list[int]]:
+    """
+    The indices of order sorted along each axis. Ties on a coordinate are
+    broken by the whole point, as in Percentiles.
+
+    Time Complexity:
+    - Best case = Worst case: O(N*log(N)), where N is the length of order
+    """
+    return [sorted(order, key=lambda i, a=axis: (points[i][a], points[i])) for axis in range(3)]
+
+
+def select_root(order: list[int], sorted_lists: list[list[int]], ranks: list[list[int]]) -> int | None:
+    """
+    The first index of order whose rank along every axis lies within
+    _rank_bounds, so that on each axis at least 1/7 of the points rank below
+    it and 1/7 above. None if there is no such point. ranks is scratch space
+    of three lists, indexed like the points.
+
+    Time Complexity:
+    - Best case = Worst case: O(N), where N is the length of order
+    """
+    lower, upper = _rank_bounds(len(order))
+    for axis in range(3):
+        axis_ranks = ranks[axis]
+        for rank, i in enumerate(sorted_lists[axis]):
+            axis_ranks[i] = rank
+    for i in order:
+        if lower <= ranks[0][i] <= upper and lower <= ranks[1][i] <= upper and lower <= ranks[2][i] <= upper:
+            return i
+    return None
+
+
+def split_octants(points: list[Point], order: list[int], sorted_lists: list[list[int]], root_index: int | None,
+                  root: Point, octant_index: Callable[[Point, Point], int],
+                  octant_of: list[int]) -> tuple[list[list[int]], list[list[list[int]]]]:
+    """
+    Splits the indices of order, less root_index, into the octants of root.
+    Returns, for each octant, its indices in the order of order and sorted
+    along each axis; the filter is stable, so nothing is sorted again.
+    octant_of is scratch space indexed like the points.
+
+    Time Complexity:
+    - Best case = Worst case: O(N), where N is the length of order
+    """
+    octant_orders = [[] for _ in range(8)]
+    appends = [octant_order.append for octant_order in octant_orders]
+    for i in order:
+        if i != root_index:
+            octant = octant_index(points[i], root)
+            octant_of[i] = octant
+            appends[octant](i)
+
+    octant_sorted = [[[] for _ in range(3)] for _ in range(8)]
+    for axis in range(3):
+        appends = [octant_sorted[octant][axis].append for octant in range(8)]
+        for i in sorted_lists[axis]:
+            if i != root_index:
+                appends[octant_of[i]](i)
+    return octant_orders, octant_sorted
 
 
 def make_ordering(my_coordinate_list: list[Point]) -> list[Point]:
     """
+    Orders the points so that inserting them into a 3DBT in that order gives
+    a balanced tree. The input list is not modified. See iter_ordering.
+
     Time Complexity:
-    - Worst case: O(O(N*log(N)*log(N)), where N is the length of my_coordinate_list
-    - Best case: O(len(points)), when the length of the my_coordinate_list is less than or equal to 6
-    """
-    def _octant_index(point, root):
-        """
-        This function returns the octant index of a point that
-        represents the region in which the point resides in a space.
-        If octant_index > 0, the point is in the positive half of the axis.
-
-        Time Complexity:
-        - Best case = Worst case: O(1)
-        """
-        octant_index = 0
-        if point[0] > root[0]:
-            octant_index += 1
-        if point[1] > root[1]:
-            octant_index += 2
-        if point[2] > root[2]:
-            octant_index += 4
-        return octant_index
-
-    def ordering_aux(points, result):
-        """
-        Auxiliary method for ordering the list in a balance way
-
-        Time Complexity:
-        - Worst case: O(N*log(N)*log(N)), where N is the length of my_coordinate_list
-                N : when iterating through points to add them into percentile objects
-                log N: when checking for the common points in three lists created by ratio method
-                log N: recursion for log N times
-
-        - Best case: O(len(points)), when the length of the my_coordinate_list is less than or equal to 6
-        """
-        if len(points) <= 17:  # Base case: return the points with its pointers
-            result.extend(points)  # O(k), where k is the length of list
-            return points
-
-        x_percentile = Percentiles()
-        y_percentile = Percentiles()
-        z_percentile = Percentiles()
-
-        for point in points:
-            x_percentile.add_point((point[0], point))
-            y_percentile.add_point((point[1], point))
-            z_percentile.add_point((point[2], point))
-
-        ratio = (1 / 7) * 100
-        x_list = x_percentile.ratio(ratio, ratio)
-        y_list = y_percentile.ratio(ratio, ratio)
-        z_list = z_percentile.ratio(ratio, ratio)
-        
-        root = points[0]
-        for point in points:
-            if (point[0], point) in x_list and (point[1], point) in y_list and (point[2], point) in z_list:
-                root = point
-                result.append(root)
-                points.remove(root)
-                break
-        
-        octants = [[] for _ in range(8)]
-        for point in points:
-            octants[_octant_index(point, root)].append(point)
-
-        for i in range(8):
-            ordering_aux(octants[i], result)
-
-    result = []
-    ordering_aux(my_coordinate_list, result)
-    return result
\ No newline at end of file
+    - Worst case: O(N*log(N) + N*D), where N is the length of my_coordinate_list and D the depth of the octants
+    - Best case: O(len(points)), when the length of the my_coordinate_list is less than or equal to 17
+    """
+    return list(iter_ordering(my_coordinate_list))
+
+
+def iter_ordering(points: list[Point]) -> Iterator[Point]:
+    """
+    Yields the points in the order of make_ordering, as soon as each is
+    placed, so a 3DBT can be filled while the ordering is produced. The input
+    is neither modified nor copied: the work stack only holds indices.
+
+    Every point is sorted once along each axis. Each level then picks its root
+    from rank lookups in those sorted lists and splits them into octants with
+    a stable O(n) filter, so the lists stay sorted without sorting again.
+
+    Time Complexity:
+    - Worst case: O(N*log(N) + N*D), where N is the length of points and D the depth of the octants
+    - Best case: O(len(points)), when the length of points is less than or equal to 17
+    """
+    n = len(points)
+    if n <= BASE_CASE_SIZE:
+        yield from points
+        return
+
+    ranks = [[0] * n for _ in range(3)]
+    octant_of = [0] * n
+    # Each entry holds the indices of one octant in input order, and the same
+    # indices sorted along each axis.
+    stack = [(list(range(n)), sort_by_axis(points, range(n)))]
+    while stack:
+        order, sorted_lists = stack.pop()
+        if len(order) <= BASE_CASE_SIZE:  # Base case: the points in their own order
+            for i in order:
+                yield points[i]
+            continue
+
+        root_index = select_root(order, sorted_lists, ranks)
+        if root_index is None:  # No balanced root: fall back to the first point
+            root_index = order[0]
+        root = points[root_index]
+        yield root
+        octant_orders, octant_sorted = split_octants(points, order, sorted_lists, root_index, root,
+                                                     _octant_index, octant_of)
+        del order, sorted_lists
+
+        # Pushed in reverse so that octant 0 is ordered first.
+        for octant in range(7, -1, -1):
+            if octant_orders[octant]:
+                stack.append((octant_orders[octant], octant_sorted[octant]))
+
+
+def make_ordering_parallel(my_coordinate_list: list[Point], processes: int | None = None,
+                           threshold: int = PARALLEL_THRESHOLD) -> list[Point]:
+    """
+    Same ordering as make_ordering, with the octants under the root ordered in
+    a process pool. Every octant is independent, and ordering one on its own
+    gives exactly what the serial recursion produces for it. Inputs, and
+    octants, with fewer than threshold points are ordered in this process.
+
+    Time Complexity:
+    - Worst case: O(N*log(N) + N*D), as make_ordering, spread over the processes
+    - Best case: O(len(points)), when the length of the my_coordinate_list is less than or equal to 17
+    """
+    points = my_coordinate_list
+    if len(points) < max(threshold, BASE_CASE_SIZE + 1):
+        return make_ordering(points)
+
+    size = len(points)
+    order = list(range(size))
+    sorted_lists = sort_by_axis(points, order)
+    root_index = select_root(order, sorted_lists, [[0] * size for _ in range(3)])
+    if root_index is None:
+        root_index = 0
+    root = points[root_index]
+    result = [root]
+    octant_orders, _ = split_octants(points, order, sorted_lists, root_index, root, _octant_index, [0] * size)
+    octants = [[points[i] for i in octant_order] for octant_order in octant_orders]
+
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(make_ordering, octant) if len(octant) >= threshold else None for octant in octants]
+        for octant, future in zip(octants, futures):
+            result.extend(make_ordering(octant) if future is None else future.result())
+    return result
+
+
+def make_ordering_numpy(coordinates):
+    """
+    Vectorised make_ordering for an (N, 3) integer array, returning the
+    ordered points as a new (N, 3) array. Requires numpy.
+
+    Each level finds the per-axis cut-off values with np.partition, picks as
+    root the first point lying between them on all three axes, and splits
+    the rest into octants with one stable argsort of their octant codes.
+    Roots are chosen by coordinate value rather than (coordinate, point)
+    rank, which is the same choice whenever coordinates along an axis are
+    distinct, and the same balance guarantee.
+
+    Time Complexity:
+    - Worst case: O(N*D) array operations, where N is the number of points and D the depth of the recursion
+    - Best case: O(N), when there are no more than 17 points
+    """
+    if np is None:
+        raise ImportError('make_ordering_numpy requires numpy')
+    coordinates = np.asarray(coordinates)
+    if coordinates.ndim != 2 or coordinates.shape[1] != 3:
+        raise ValueError('Expected an (N, 3) array of points.')
+
+    ordering = []
+    # Stack of index arrays into coordinates, each in input order.
+    stack = [np.arange(len(coordinates))]
+    while stack:
+        indices = stack.pop()
+        if len(indices) <= BASE_CASE_SIZE:
+            ordering.append(indices)
+            continue
+
+        points = coordinates[indices]
+        lower, upper = _rank_bounds(len(indices))
+        bounds = np.partition(points, (lower, upper), axis=0)
+        inside = np.all((points >= bounds[lower]) & (points <= bounds[upper]), axis=1)
+        # Without a point inside every bound, fall back to the first point.
+        root = int(np.argmax(inside)) if inside.any() else 0
+        ordering.append(indices[root:root + 1])
+
+        rest = np.delete(np.arange(len(indices)), root)
+        codes = (points[rest] > points[root]) @ np.array([1, 2, 4])
+        order = rest[np.argsort(codes, kind='stable')]
+        ends = np.cumsum(np.bincount(codes, minlength=8))
+        starts = ends - np.bincount(codes, minlength=8)
+        for octant in range(7, -1, -1):
+            if ends[octant] > starts[octant]:
+                stack.append(indices[order[starts[octant]:ends[octant]]])
+
+    return coordinates[np.concatenate(ordering)]
+
+
+def _benchmark() -> None:
+    import os
+    import random
+    import time
+
+    for n in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+        coords = random.Random(n).sample(range(10 * n), 3 * n)
+        points = [(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]) for i in range(n)]
+        start = time.perf_counter()
+        serial = make_ordering(points)
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = make_ordering_parallel(points)
+        parallel_time = time.perf_counter() - start
+        assert parallel == serial
+        print('make_ordering of {0:>9,} points: serial {1:8.2f}s, parallel {2:8.2f}s ({3:.2f}x on {4} cores)'.format(
+            n, serial_time, parallel_time, serial_time / parallel_time, os.cpu_count()))
+        if np is not None:
+            array = np.array(points)
+            start = time.perf_counter()
+            make_ordering_numpy(array)
+            print('{0:>40}numpy {1:8.2f}s'.format('', time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,143 @@
+""" Batches of independent queries against one static ThreeDeeBeeTree, spread over processes. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable
+
+from flat_tree import FlatThreeDeeBeeTree, flatten
+from threedeebeetree import Point, ThreeDeeBeeTree
+
+BATCH_SIZE = 2000
+
+# Query kinds, each answered by the method of the same meaning on a tree:
+#   ('get', key, default)  -> tree.get(key, default)
+#   ('range', lo, hi)      -> list(tree.range_query(lo, hi))
+#   ('count', lo, hi)      -> tree.count_in_box(lo, hi)
+Query = tuple
+
+# The tree of a worker process, attached once by _attach.
+_tree = None
+_shm = None
+
+
+def answer(tree, query: Query):
+    """ Answers a single query against a ThreeDeeBeeTree or a FlatThreeDeeBeeTree. """
+    kind = query[0]
+    if kind == 'get':
+        return tree.get(query[1], query[2])
+    elif kind == 'range':
+        return list(tree.range_query(query[1], query[2]))
+    elif kind == 'count':
+        return tree.count_in_box(query[1], query[2])
+    raise ValueError('Unknown query kind: {0}'.format(kind))
+
+
+def _attach(name: str) -> None:
+    global _tree, _shm
+    # Pool workers share the executor's resource tracker, so attaching does
+    # not register the block a second time and it is unlinked only once.
+    _shm = SharedMemory(name=name)
+    _tree = FlatThreeDeeBeeTree(_shm.buf)
+
+
+def _run_batch(batch: list[Query]) -> list:
+    return [answer(_tree, query) for query in batch]
+
+
+class BatchQueryExecutor:
+    """
+    Answers batches of queries against a snapshot of a tree in a process pool.
+
+    The tree is flattened once into a block of shared memory (the layout of
+    flat_tree), which every worker maps read-only instead of receiving a
+    pickled copy. Queries are sent in batches of batch_size and the results
+    come back in the order of the queries. Later changes to the tree are not
+    seen by the executor.
+    """
+
+    def __init__(self, tree: ThreeDeeBeeTree, processes: int | None = None, batch_size: int = BATCH_SIZE) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(N + P), where N is the number of nodes and P the size of the pickled items
+        """
+        if batch_size <= 0:
+            raise ValueError('batch_size must be positive.')
+        self.batch_size = batch_size
+        data = flatten(tree)
+        self.shm = SharedMemory(create=True, size=len(data))
+        self.shm.buf[:len(data)] = data
+        self.pool = ProcessPoolExecutor(processes, initializer=_attach, initargs=(self.shm.name,))
+
+    def __enter__(self) -> BatchQueryExecutor:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Stops the workers and frees the shared memory. """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            self.shm.close()
+            self.shm.unlink()
+
+    def run(self, queries: Iterable[Query]) -> list:
+        """
+        Answers of the queries, in the same order.
+
+        Time Complexity:
+        - Best case = Worst case: the total cost of the queries, spread over the processes
+        """
+        if self.pool is None:
+            raise ValueError('The executor is closed.')
+        queries = list(queries)
+        batches = [queries[i:i + self.batch_size] for i in range(0, len(queries), self.batch_size)]
+        result = []
+        for answers in self.pool.map(_run_batch, batches):
+            result.extend(answers)
+        return result
+
+    def get_many(self, keys: Iterable[Point], default=None) -> list:
+        return self.run(('get', key, default) for key in keys)
+
+    def range_queries(self, boxes: Iterable[tuple[Point, Point]]) -> list[list]:
+        return self.run(('range', lo, hi) for lo, hi in boxes)
+
+    def count_in_boxes(self, boxes: Iterable[tuple[Point, Point]]) -> list[int]:
+        return self.run(('count', lo, hi) for lo, hi in boxes)
+
+
+def _benchmark(n: int = 10 ** 5) -> None:
+    import os
+    import random
+    import time
+
+    rng = random.Random(n)
+    coords = rng.sample(range(10 * n), 3 * n)
+    points = [(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]) for i in range(n)]
+    tree = ThreeDeeBeeTree.build_balanced((point, i) for i, point in enumerate(points))
+    queries = [('get', point, None) for point in rng.sample(points, n)]
+    for _ in range(n // 20):
+        corner = rng.choice(points)
+        queries.append(('count', corner, tuple(c + n // 2 for c in corner)))
+    rng.shuffle(queries)
+
+    start = time.perf_counter()
+    expected = [answer(tree, query) for query in queries]
+    serial = time.perf_counter() - start
+    print('{0:,} queries, serial loop: {1:6.2f}s'.format(len(queries), serial))
+    for processes in (1, 2, 4):
+        with BatchQueryExecutor(tree, processes) as executor:
+            executor.run(queries[:processes])  # start the workers
+            start = time.perf_counter()
+            assert executor.run(queries) == expected
+            elapsed = time.perf_counter() - start
+        print('{0} processes: {1:6.2f}s ({2:.2f}x, {3} cores)'.format(
+            processes, elapsed, serial / elapsed, os.cpu_count()))
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -1,5 +1,8 @@
+from __future__ import annotations
 from dataclasses import dataclass
 from heap import MaxHeap
+from threedeebeetree import (BeeNode, ThreeDeeBeeTree, Point, UNBOUNDED, octant_region, region_distance_squared,
+                             region_overlaps)
 
 
 @dataclass
@@ -14,45 +17,50 @@ class Beehive:
     nutrient_factor: int
     volume: int = 0
 
+    def value(self, volume: float | None = None) -> float:
+        """
+        Emeralds harvesting this hive would give, at its current volume or the
+        given one.
+
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        return self.nutrient_factor * min(self.capacity, self.volume if volume is None else volume)
+
     def __lt__(self, beehive) -> bool:
         """
         Time Complexity:
         - Best case = Worst case: O(1), only performing arithmetic operations
         """
-        return (self.nutrient_factor * min(self.capacity, self.volume)) < (
-                    beehive.nutrient_factor * min(beehive.capacity, beehive.volume))
+        return self.value() < beehive.value()
 
     def __le__(self, beehive) -> bool:
         """
         Time Complexity:
         - Best case = Worst case: O(1), only performing arithmetic operations
         """
-        return (self.nutrient_factor * min(self.capacity, self.volume)) <= (
-                    beehive.nutrient_factor * min(beehive.capacity, beehive.volume))
+        return self.value() <= beehive.value()
 
     def __gt__(self, beehive) -> bool:
         """
         Time Complexity:
         - Best case = Worst case: O(1), only performing arithmetic operations
         """
-        return (self.nutrient_factor * min(self.capacity, self.volume)) > (
-                    beehive.nutrient_factor * min(beehive.capacity, beehive.volume))
+        return self.value() > beehive.value()
 
     def __ge__(self, beehive) -> bool:
         """
         Time Complexity:
         - Best case = Worst case: O(1), only performing arithmetic operations
         """
-        return (self.nutrient_factor * min(self.capacity, self.volume)) >= (
-                    beehive.nutrient_factor * min(beehive.capacity, beehive.volume))
+        return self.value() >= beehive.value()
 
     def __eq__(self, beehive) -> bool:
         """
         Time Complexity:
         - Best case = Worst case: O(1), only performing arithmetic operations
         """
-        return (self.nutrient_factor * min(self.capacity, self.volume)) == (
-                    beehive.nutrient_factor * min(beehive.capacity, beehive.volume))
+        return self.value() == beehive.value()
 
 class BeehiveSelector:
 
@@ -93,4 +101,197 @@ class BeehiveSelector:
         quantity = min(hive.volume, hive.capacity)
         hive.volume -= quantity
         self.add_beehive(hive)
-        return quantity * hive.nutrient_factor
\ No newline at end of file
+        return quantity * hive.nutrient_factor
+
+
+@dataclass
+class HiveNode(BeeNode):
+    """ BeeNode which also remembers the best beehive stored in its subtree. """
+
+    best: Beehive | None = None
+
+    def refresh_best(self) -> None:
+        """
+        Recomputes best from this node's hive and the best of each child.
+
+        Time Complexity:
+        - Best case = Worst case: O(1), always looks at the node and its 8 children
+        """
+        best = self.item
+        for child in self.child:
+            if child is not None and child.best > best:
+                best = child.best
+        self.best = best
+
+
+class RegionalBeehiveSelector:
+    """
+    Beehive selector which indexes hives by their position in a 3DBT, so that
+    the best hive inside a box or a sphere can be harvested without scanning
+    every hive.
+    """
+
+    def __init__(self) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        self.tree = ThreeDeeBeeTree()
+        self.tree.node_type = HiveNode
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def set_all_beehives(self, hive_list: list[Beehive]) -> None:
+        """
+        Builds a balanced tree of the hives with ThreeDeeBeeTree.build_subtree,
+        whatever their order, then fills in best from the leaves up.
+
+        Time Complexity:
+        - Best case = Worst case: O(M * log(M) + M * D), where M is the len(hive_list) and D is the depth of the tree
+        """
+        self.__init__()
+        self.tree.root = self.tree.build_subtree([((hive.x, hive.y, hive.z), hive) for hive in hive_list])
+        self.tree.length = len(hive_list)
+
+        nodes = []
+        stack = [self.tree.root]
+        while stack:
+            node = stack.pop()
+            if node is not None:
+                nodes.append(node)
+                stack.extend(node.child)
+        for node in reversed(nodes):  # children before their parents
+            node.refresh_best()
+
+    def add_beehive(self, hive: Beehive) -> None:
+        """
+        Inserts the hive at its position and refreshes best along the path.
+
+        Time Complexity:
+        - Worst case: O(D), where D is the depth of the tree
+        - Best case: O(1), when the tree is empty
+        """
+        key = (hive.x, hive.y, hive.z)
+        path = []
+        current = self.tree.root
+        while current is not None:
+            if current.key == key:
+                raise ValueError('Inserting duplicate item')
+            path.append(current)
+            current = current.get_child_for_key(key)
+
+        node = HiveNode(key, item=hive, best=hive)
+        if path:
+            parent = path[-1]
+            parent.set_child(ThreeDeeBeeTree.octant_for(parent.key, key), node)
+        else:
+            self.tree.root = node
+        self.tree.length += 1
+
+        for ancestor in path:
+            ancestor.subtree_size += 1
+        self._refresh(path)
+
+    def harvest_best_beehive(self) -> float:
+        """
+        Harvests the best hive overall.
+
+        Time Complexity:
+        - Best case = Worst case: O(D), where D is the depth of the tree
+        """
+        if self.tree.root is None:
+            raise IndexError
+        return self._harvest(self.tree.root.best)
+
+    def harvest_best_beehive_in_box(self, lo: Point, hi: Point) -> float:
+        """
+        Harvests the best hive with lo <= (x, y, z) <= hi on every axis.
+        Raises IndexError if there is no hive inside the box.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of hives, when no subtree can be pruned
+        - Best case: O(D), where D is the depth of the tree, when the best hive overall lies in the box
+        """
+        def inside(key):
+            return all(lo[i] <= key[i] <= hi[i] for i in range(3))
+
+        def overlaps(region):
+            return region_overlaps(region, lo, hi)
+
+        hive = self.best_in_region(inside, overlaps)
+        if hive is None:
+            raise IndexError
+        return self._harvest(hive)
+
+    def harvest_best_beehive_in_radius(self, centre: Point, radius: float) -> float:
+        """
+        Harvests the best hive within (euclidean) radius of centre.
+        Raises IndexError if there is no hive inside the sphere.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of hives, when no subtree can be pruned
+        - Best case: O(D), where D is the depth of the tree, when the best hive overall lies in the sphere
+        """
+        r_squared = radius * radius
+
+        def inside(key):
+            return sum((key[i] - centre[i]) ** 2 for i in range(3)) <= r_squared
+
+        def overlaps(region):
+            return region_distance_squared(region, centre) <= r_squared
+
+        hive = self.best_in_region(inside, overlaps)
+        if hive is None:
+            raise IndexError
+        return self._harvest(hive)
+
+    def best_in_region(self, inside, overlaps) -> Beehive | None:
+        """
+        Branch and bound search for the best hive whose key satisfies inside.
+        overlaps(region) must return False only if no key within the Region
+        of a subtree can satisfy inside. Subtrees are skipped when they do not
+        overlap the query or cannot beat the best hive found so far.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of hives
+        - Best case: O(D), where D is the depth of the tree
+        """
+        best = None
+        stack = [(self.tree.root, UNBOUNDED)]
+        while stack:
+            current, region = stack.pop()
+            if current is None or (best is not None and not current.best > best):
+                continue
+            if not overlaps(region):
+                continue
+            if inside(current.key) and (best is None or current.item > best):
+                best = current.item
+            for octant in range(8):
+                child = current.child[octant]
+                if child is not None:
+                    stack.append((child, octant_region(region, current.key, octant)))
+        return best
+
+    def _harvest(self, hive: Beehive) -> float:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(D), where D is the depth of the tree
+        """
+        quantity = min(hive.volume, hive.capacity)
+        hive.volume -= quantity
+        key = (hive.x, hive.y, hive.z)
+        path = []
+        current = self.tree.root
+        while current is not None:
+            path.append(current)
+            if current.key == key:
+                break
+            current = current.get_child_for_key(key)
+        self._refresh(path)
+        return quantity * hive.nutrient_factor
+
+    @staticmethod
+    def _refresh(path: list[HiveNode]) -> None:
+        for node in reversed(path):
+            node.refresh_best()
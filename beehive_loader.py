@@ -0,0 +1,96 @@
+""" Streaming loaders which read beehives from CSV or JSON-lines files. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+import csv
+import json
+from itertools import islice
+from typing import Iterable, Iterator
+
+from beehive import Beehive, BeehiveSelector
+from heap import MaxHeap
+
+FIELDS = ('x', 'y', 'z', 'capacity', 'nutrient_factor', 'volume')
+
+
+def iter_beehives_csv(path: str) -> Iterator[Beehive]:
+    """
+    Yields one Beehive per row of a CSV file with a header naming the Beehive
+    fields. volume may be left out, as in the Beehive constructor.
+
+    Time Complexity:
+    - Best case = Worst case: O(1) per hive, with O(1) memory besides the current row
+    """
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield Beehive(**{name: int(row[name]) for name in FIELDS if row.get(name) not in (None, '')})
+
+
+def iter_beehives_jsonl(path: str) -> Iterator[Beehive]:
+    """
+    Yields one Beehive per non-empty line of a JSON-lines file, each line being
+    an object with the Beehive fields.
+
+    Time Complexity:
+    - Best case = Worst case: O(1) per hive, with O(1) memory besides the current line
+    """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield Beehive(**{name: record[name] for name in FIELDS if name in record})
+
+
+def iter_beehives(path: str) -> Iterator[Beehive]:
+    """ Picks the reader from the file extension (.csv, or .jsonl / .json for JSON lines). """
+    if path.endswith('.csv'):
+        return iter_beehives_csv(path)
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return iter_beehives_jsonl(path)
+    raise ValueError('Unknown beehive file format: {0}'.format(path))
+
+
+def top_beehives(hives: Iterable[Beehive], n: int) -> list[Beehive]:
+    """
+    Keeps only the n best hives of a stream. The worst kept hive sits at the top
+    of a bounded heap of negated values, so every other hive is either dropped
+    or replaces it.
+
+    Time Complexity:
+    - Worst case: O(M * log(n)), where M is the number of hives in the stream, when every hive is better than the kept ones
+    - Best case: O(M + n * log(n)), when no hive after the first n is better than the kept ones
+    """
+    if n <= 0:
+        return []
+    kept = MaxHeap(n)
+    for seq, hive in enumerate(hives):
+        value = hive.value()
+        if len(kept) < n:
+            kept.add((-value, seq, hive))
+        elif -kept.the_array[1][0] < value:
+            kept.get_max()
+            kept.add((-value, seq, hive))
+    return [kept.the_array[i][2] for i in range(1, len(kept) + 1)]
+
+
+def load_beehives(selector: BeehiveSelector, path: str, top_n: int | None = None) -> None:
+    """
+    Streams the hives in path into selector, replacing the hives it had.
+    With top_n, only the top_n best hives are kept, so peak memory scales with
+    top_n rather than with the size of the file.
+
+    Without top_n, reading stops at the first hive beyond selector.max_beehives
+    and raises IndexError, leaving the selector with the hives it had.
+
+    Time Complexity:
+    - Worst case: O(M * log(K)), where M is the number of hives in the file and K the number kept
+    - Best case: O(M), when every hive read is smaller than the ones already kept
+    """
+    hives = iter_beehives(path)
+    if top_n is not None:
+        selector.set_all_beehives(top_beehives(hives, top_n))
+        return
+    hive_list = list(islice(hives, selector.max_beehives + 1))
+    if len(hive_list) > selector.max_beehives:
+        raise IndexError('{0} holds more than {1} beehives'.format(path, selector.max_beehives))
+    selector.set_all_beehives(hive_list)
@@ -248,4 +248,186 @@ class BinarySearchTree(Generic[K, I]):
             # There might be some elements in right subtree within range
             self.sorted_splice_aux(current.right, a, b, elements)
 
-        return elements
\ No newline at end of file
+        return elements
+
+    def iter_splice(self, a: K, b: K):
+        """
+        Generator version of sorted_splice, walking the tree with an explicit
+        stack so that no list of the output is built.
+
+        Time Complexity:
+        - Best case = Worst case: O(O + D) over the whole iteration, where O is the number of keys yielded
+          and D the depth of the tree
+        """
+        stack = []
+        current = self.root
+        while stack or current is not None:
+            if current is not None:
+                stack.append(current)
+                # Only go left while keys there may still be >= a
+                current = current.left if current.key > a else None
+            else:
+                current = stack.pop()
+                if current.key > b:
+                    return
+                if current.key >= a:
+                    for _ in range(self.copies(current)):
+                        yield current.key
+                current = current.right
+
+    def copies(self, current: TreeNode) -> int:
+        """ Number of points the node stands for. """
+        return 1
+
+    def count_less(self, key: K) -> int:
+        """
+        Number of points with a key strictly smaller than key.
+        :complexity: O(CompK * D) where D is the depth of the tree
+        """
+        total = 0
+        current = self.root
+        while current is not None:
+            if key <= current.key:
+                current = current.left
+            else:
+                if current.left is not None:
+                    total += current.left.subtree_size
+                total += self.copies(current)
+                current = current.right
+        return total
+
+    def count_less_equal(self, key: K) -> int:
+        """
+        Number of points with a key smaller than or equal to key.
+        :complexity: O(CompK * D) where D is the depth of the tree
+        """
+        total = 0
+        current = self.root
+        while current is not None:
+            if key < current.key:
+                current = current.left
+            else:
+                if current.left is not None:
+                    total += current.left.subtree_size
+                total += self.copies(current)
+                current = current.right
+        return total
+
+
+class MultisetBinarySearchTree(BinarySearchTree[K, int]):
+    """
+    Binary search tree storing one node per distinct key, whose item is the
+    number of copies of that key. subtree_size counts copies rather than nodes,
+    so order statistics see every copy, while len() is the number of distinct keys.
+    """
+
+    def add(self, key: K) -> None:
+        """
+        Adds one copy of key.
+        :complexity best: O(CompK) the key is at the root
+        :complexity worst: O(CompK * D) where D is the depth of the tree
+        """
+        self.root = self.add_aux(self.root, key)
+
+    def add_aux(self, current: TreeNode, key: K) -> TreeNode:
+        if current is None:
+            current = TreeNode(key, item=1)
+            self.length += 1
+            return current
+        elif key < current.key:
+            current.left = self.add_aux(current.left, key)
+        elif key > current.key:
+            current.right = self.add_aux(current.right, key)
+        else:  # key == current.key
+            current.item += 1
+        current.subtree_size += 1
+        return current
+
+    def remove(self, key: K) -> None:
+        """
+        Removes one copy of key, and the node once no copies are left.
+        :complexity best: O(CompK) the key is at the root with more than one copy
+        :complexity worst: O(CompK * D) where D is the depth of the tree
+        """
+        self.root = self.remove_aux(self.root, key)
+
+    def remove_aux(self, current: TreeNode, key: K) -> TreeNode:
+        if current is None:  # key not found
+            raise ValueError('Deleting non-existent item')
+        elif key < current.key:
+            current.left = self.remove_aux(current.left, key)
+        elif key > current.key:
+            current.right = self.remove_aux(current.right, key)
+        elif current.item > 1:
+            current.item -= 1
+        else:  # last copy => remove the node itself
+            self.length -= 1
+            if current.left is None:
+                return current.right
+            elif current.right is None:
+                return current.left
+
+            # general case => move the successor, with all its copies, up here
+            succ = self.get_successor(current)
+            current.key = succ.key
+            current.item = succ.item
+            current.right = self.detach_minimal(current.right, succ.item)
+        current.subtree_size -= 1
+        return current
+
+    def detach_minimal(self, current: TreeNode, count: int) -> TreeNode:
+        """ Unlinks the minimal node of the subtree, which holds count copies. """
+        if current.left is None:
+            return current.right
+        current.left = self.detach_minimal(current.left, count)
+        current.subtree_size -= count
+        return current
+
+    def copies(self, current: TreeNode) -> int:
+        return current.item
+
+    def count(self, key: K) -> int:
+        """ Number of copies of key. """
+        try:
+            return self[key]
+        except KeyError:
+            return 0
+
+    def kth_smallest(self, k: int, current: TreeNode) -> TreeNode:
+        """
+        Finds the node holding the kth smallest copy in the subtree rooted at current.
+
+        Time Complexity:
+        - Worst case: O(D) where D is the maximum depth of the tree, when the tree is unbalanced
+        - Best case: O(1), when the kth copy is at current
+        """
+        if current is None:
+            raise ValueError
+
+        if k > current.subtree_size:
+            return None
+
+        left_size = 0
+        if current.left is not None:
+            left_size = current.left.subtree_size
+
+        if k <= left_size:
+            return self.kth_smallest(k, current.left)
+        elif k <= left_size + current.item:
+            return current
+        else:
+            return self.kth_smallest(k - left_size - current.item, current.right)
+
+    def sorted_splice_aux(self, current: TreeNode[K, I], a, b, elements: list[K]):
+        """
+        Same as BinarySearchTree.sorted_splice_aux, with each key repeated once per copy.
+        """
+        if current is None:
+            return elements
+        if current.key > a:
+            self.sorted_splice_aux(current.left, a, b, elements)
+        if a <= current.key <= b:
+            elements.extend([current.key] * current.item)
+        if current.key < b:
+            self.sorted_splice_aux(current.right, a, b, elements)
+        return elements
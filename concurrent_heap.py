@@ -0,0 +1,157 @@
+""" MaxHeap wrappers which are safe to share between threads or asyncio tasks. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+import asyncio
+import threading
+from typing import Generic
+
+from heap import MaxHeap
+from referential_array import T
+
+
+class ConcurrentMaxHeap(Generic[T]):
+    """
+    Lock protected MaxHeap. With a max_size, add blocks while the heap is full;
+    without one the heap grows as needed. get_max blocks while it is empty.
+    Both raise IndexError when told not to block, or on timeout.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, max_size: int | None = None) -> None:
+        self.max_size = max_size
+        self.heap = MaxHeap(self.INITIAL_CAPACITY if max_size is None else max_size)
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.heap)
+
+    def add(self, element: T, block: bool = True, timeout: float | None = None) -> None:
+        """
+        Time Complexity:
+        - Worst case: O(log(N)), where N is the number of elements, plus any waiting for space
+        - Best case: O(1), when the element does not have to rise
+        """
+        with self.not_full:
+            if self.heap.is_full():
+                if self.max_size is None:
+                    self.heap.grow()
+                elif not block or not self.not_full.wait_for(lambda: not self.heap.is_full(), timeout):
+                    raise IndexError
+            self.heap.add(element)
+            self.not_empty.notify()
+
+    def get_max(self, block: bool = True, timeout: float | None = None) -> T:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(log(N)), where N is the number of elements, plus any waiting for an element
+        """
+        with self.not_empty:
+            if len(self.heap) == 0 and (not block or not self.not_empty.wait_for(lambda: len(self.heap) > 0, timeout)):
+                raise IndexError
+            element = self.heap.get_max()
+            self.not_full.notify()
+            return element
+
+
+class AsyncMaxHeap(Generic[T]):
+    """
+    MaxHeap for asyncio tasks. get_max waits while the heap is empty and, with
+    a max_size, add waits while it is full, pushing back on producers.
+    Must be used from a single event loop.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, max_size: int | None = None) -> None:
+        self.max_size = max_size
+        self.heap = MaxHeap(self.INITIAL_CAPACITY if max_size is None else max_size)
+        self.changed = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    async def add(self, element: T) -> None:
+        """
+        Time Complexity:
+        - Worst case: O(log(N)), where N is the number of elements, plus any waiting for space
+        - Best case: O(1), when the element does not have to rise
+        """
+        async with self.changed:
+            if self.heap.is_full():
+                if self.max_size is None:
+                    self.heap.grow()
+                else:
+                    await self.changed.wait_for(lambda: not self.heap.is_full())
+            self.heap.add(element)
+            self.changed.notify_all()
+
+    async def get_max(self) -> T:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(log(N)), where N is the number of elements, plus any waiting for an element
+        """
+        async with self.changed:
+            await self.changed.wait_for(lambda: len(self.heap) > 0)
+            element = self.heap.get_max()
+            self.changed.notify_all()
+            return element
+
+
+def _benchmark_threads(producers: int, consumers: int, items: int) -> float:
+    import random
+    import time
+
+    heap = ConcurrentMaxHeap(1024)
+    per_producer = items // producers
+    per_consumer = per_producer * producers // consumers
+
+    def produce():
+        for _ in range(per_producer):
+            heap.add(random.random())
+
+    def consume():
+        for _ in range(per_consumer):
+            heap.get_max()
+
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    threads += [threading.Thread(target=consume) for _ in range(consumers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return per_consumer * consumers / (time.perf_counter() - start)
+
+
+async def _benchmark_async(producers: int, consumers: int, items: int) -> float:
+    import random
+    import time
+
+    heap = AsyncMaxHeap(1024)
+    per_producer = items // producers
+    per_consumer = per_producer * producers // consumers
+
+    async def produce():
+        for _ in range(per_producer):
+            await heap.add(random.random())
+
+    async def consume():
+        for _ in range(per_consumer):
+            await heap.get_max()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(produce() for _ in range(producers)), *(consume() for _ in range(consumers)))
+    return per_consumer * consumers / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    for producers, consumers in [(1, 1), (4, 4), (8, 2), (2, 8)]:
+        threaded = _benchmark_threads(producers, consumers, 200000)
+        asynchronous = asyncio.run(_benchmark_async(producers, consumers, 200000))
+        print('{0} producers / {1} consumers: threads {2:,.0f} items/s, asyncio {3:,.0f} items/s'.format(
+            producers, consumers, threaded, asynchronous))
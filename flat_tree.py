@@ -0,0 +1,284 @@
+""" Flat pre-order layout of a ThreeDeeBeeTree, to save to a file and query in place. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+import mmap as _mmap
+import pickle
+from array import array
+from typing import Generic, Iterator, TypeVar
+
+from threedeebeetree import Point, ThreeDeeBeeTree, UNBOUNDED, octant_region, region_inside, region_overlaps
+
+I = TypeVar('I')
+
+# The buffer is a sequence of native int64 words:
+#   header:  MAGIC, VERSION, number of nodes N, byte offset of the item section
+#   records: N records of RECORD_WORDS words, in pre-order from the root:
+#            x, y, z, subtree_size, then the record index of each of the 8
+#            children, or NO_CHILD
+#   items:   N + 1 byte offsets of each pickled item from the end of the
+#            offsets, then the pickled items themselves
+MAGIC = 0x3DBEE7EE
+VERSION = 1
+HEADER_WORDS = 4
+RECORD_WORDS = 12
+NO_CHILD = -1
+WORD = 8
+
+
+def flatten(tree: ThreeDeeBeeTree[I]) -> bytes:
+    """
+    The flat layout of tree. Items are pickled one by one so that each can be
+    unpickled on its own when looked up. A tree holding tombstones is first
+    rebuilt without them, as records only exist for live keys.
+
+    Time Complexity:
+    - Worst case: O(N*log(N) + P), where N is the number of nodes and P the size of the pickled items, with tombstones
+    - Best case: O(N + P), without tombstones
+    """
+    if tree.tombstones:
+        tree = ThreeDeeBeeTree.build_balanced(tree.iter_subtree(tree.root))
+    nodes = []
+    stack = [tree.root]
+    while stack:
+        node = stack.pop()
+        if node is not None:
+            nodes.append(node)
+            stack.extend(reversed(node.child))
+    index = {id(node): i for i, node in enumerate(nodes)}
+
+    words = array('q', [MAGIC, VERSION, len(nodes), 0])
+    for node in nodes:
+        words.extend(node.key)
+        words.append(node.subtree_size)
+        words.extend(NO_CHILD if child is None else index[id(child)] for child in node.child)
+
+    pickles = [pickle.dumps(node.item, pickle.HIGHEST_PROTOCOL) for node in nodes]
+    offsets = array('q', [0])
+    for blob in pickles:
+        offsets.append(offsets[-1] + len(blob))
+    words[3] = len(words) * WORD
+    return words.tobytes() + offsets.tobytes() + b''.join(pickles)
+
+
+def save(tree: ThreeDeeBeeTree[I], path: str) -> None:
+    with open(path, 'wb') as f:
+        f.write(flatten(tree))
+
+
+def load(path: str, mmap: bool = True) -> FlatThreeDeeBeeTree:
+    """
+    Opens a file written by save. With mmap the file is mapped rather than
+    read, so loading takes O(1) time and processes loading the same file
+    share one copy of it in the page cache.
+
+    Items are unpickled when they are looked up, so only load trusted files.
+    """
+    with open(path, 'rb') as f:
+        if mmap:
+            buffer = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+    return FlatThreeDeeBeeTree(buffer)
+
+
+class FlatThreeDeeBeeTree(Generic[I]):
+    """
+    Read-only ThreeDeeBeeTree over a buffer holding the flat layout, such as
+    a memory-mapped file or a block of shared memory. Queries walk the
+    records in place, the same way ThreeDeeBeeTree walks its nodes.
+    """
+
+    def __init__(self, buffer) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        self.buffer = buffer
+        raw = memoryview(buffer).cast('B')
+        # The pickled items need not end on a word, nor a block of shared
+        # memory at the end of the data; only whole words are viewed.
+        self.words = raw[:len(raw) - len(raw) % WORD].cast('q')
+        raw.release()
+        if len(self.words) < HEADER_WORDS or self.words[0] != MAGIC or self.words[1] != VERSION:
+            self.words.release()
+            raise ValueError('Not a flat ThreeDeeBeeTree.')
+        self.length = self.words[2]
+        items_start = self.words[3] // WORD
+        self.item_offsets = self.words[items_start:items_start + self.length + 1]
+        self.items_start = (items_start + self.length + 1) * WORD
+
+    def close(self) -> None:
+        """ Releases the buffer. Closes it too if it is a memory map. """
+        self.item_offsets.release()
+        self.words.release()
+        if isinstance(self.buffer, _mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self) -> FlatThreeDeeBeeTree[I]:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def key(self, record: int) -> Point:
+        base = HEADER_WORDS + record * RECORD_WORDS
+        words = self.words
+        return words[base], words[base + 1], words[base + 2]
+
+    def subtree_size(self, record: int) -> int:
+        return self.words[HEADER_WORDS + record * RECORD_WORDS + 3]
+
+    def child(self, record: int, octant: int) -> int:
+        """ Record index of the given child, or NO_CHILD. """
+        return self.words[HEADER_WORDS + record * RECORD_WORDS + 4 + octant]
+
+    def item(self, record: int) -> I:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(P), where P is the size of the pickled item
+        """
+        start = self.items_start + self.item_offsets[record]
+        end = self.items_start + self.item_offsets[record + 1]
+        return pickle.loads(self.buffer[start:end])
+
+    def find(self, key: Point) -> int:
+        """
+        Record index of key, or NO_CHILD if key is not in the tree.
+
+        Time Complexity:
+        - Worst case: O(D), where D is the maximum depth of the tree
+        - Best case: O(1), the key is at the root
+        """
+        if self.length == 0:
+            return NO_CHILD
+        words = self.words
+        x, y, z = key
+        record = 0
+        while record != NO_CHILD:
+            base = HEADER_WORDS + record * RECORD_WORDS
+            kx, ky, kz = words[base], words[base + 1], words[base + 2]
+            if kx == x and ky == y and kz == z:
+                return record
+            octant = 0
+            if x >= kx:
+                octant += 1
+            if y >= ky:
+                octant += 2
+            if z >= kz:
+                octant += 4
+            record = words[base + 4 + octant]
+        return NO_CHILD
+
+    def __contains__(self, key: Point) -> bool:
+        return self.find(key) != NO_CHILD
+
+    def __getitem__(self, key: Point) -> I:
+        record = self.find(key)
+        if record == NO_CHILD:
+            raise KeyError('Key not found: {0}'.format(key))
+        return self.item(record)
+
+    def get(self, key: Point, default: I | None = None) -> I | None:
+        record = self.find(key)
+        return default if record == NO_CHILD else self.item(record)
+
+    def iter_subtree(self, record: int = 0) -> Iterator[tuple[Point, I]]:
+        """
+        Yields every (key, item) pair below record, in pre-order. Pre-order
+        means the subtree is the run of subtree_size records from record.
+
+        Time Complexity:
+        - Best case = Worst case: O(K), where K is the size of the subtree
+        """
+        if self.length == 0:
+            return
+        for i in range(record, record + self.subtree_size(record)):
+            yield self.key(i), self.item(i)
+
+    def _box_search(self, lo: Point, hi: Point) -> Iterator[tuple[int, bool]]:
+        """
+        Walks the records overlapping the box, yielding (record, False) for
+        each record inside it and (record, True) for each subtree whose octant
+        lies inside it.
+        """
+        if self.length == 0:
+            return
+        stack = [(0, UNBOUNDED)]
+        while stack:
+            record, region = stack.pop()
+            if region_inside(region, lo, hi):
+                yield record, True
+                continue
+            key = self.key(record)
+            if lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]:
+                yield record, False
+            for octant in range(8):
+                child = self.child(record, octant)
+                if child != NO_CHILD:
+                    child_region = octant_region(region, key, octant)
+                    if region_overlaps(child_region, lo, hi):
+                        stack.append((child, child_region))
+
+    def range_query(self, lo: Point, hi: Point) -> Iterator[tuple[Point, I]]:
+        """
+        Yields the (key, item) pairs with lo <= key <= hi on every axis.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of nodes, when no octant can be pruned
+        - Best case: O(D + K), where D is the depth of the tree and K the number of keys yielded
+        """
+        for record, whole in self._box_search(lo, hi):
+            if whole:
+                yield from self.iter_subtree(record)
+            else:
+                yield self.key(record), self.item(record)
+
+    def count_in_box(self, lo: Point, hi: Point) -> int:
+        """
+        Time Complexity:
+        - Worst case: O(N), where N is the number of nodes, when no octant can be pruned
+        - Best case: O(1), when the root's octant lies inside the box or the tree is empty
+        """
+        return sum(self.subtree_size(record) if whole else 1 for record, whole in self._box_search(lo, hi))
+
+
+def _benchmark(n: int = 10 ** 5) -> None:
+    import os
+    import random
+    import tempfile
+    import time
+
+    coords = random.Random(n).sample(range(10 * n), 3 * n)
+    pairs = [((coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]), i) for i in range(n)]
+    start = time.perf_counter()
+    tree = ThreeDeeBeeTree.build_balanced(pairs)
+    print('build_balanced of {0:,} points: {1:6.3f}s'.format(n, time.perf_counter() - start))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tree.3dbt')
+        start = time.perf_counter()
+        save(tree, path)
+        print('save: {0:6.3f}s, {1:,} bytes'.format(time.perf_counter() - start, os.path.getsize(path)))
+        for mapped in (True, False):
+            start = time.perf_counter()
+            flat = load(path, mmap=mapped)
+            loaded = time.perf_counter()
+            for key, _ in pairs[:10 ** 4]:
+                flat[key]
+            print('load(mmap={0}): {1:8.5f}s, then 10,000 lookups {2:6.3f}s'.format(
+                mapped, loaded - start, time.perf_counter() - loaded))
+            flat.close()
+    start = time.perf_counter()
+    for key, _ in pairs[:10 ** 4]:
+        tree[key]
+    print('ThreeDeeBeeTree, 10,000 lookups {0:6.3f}s'.format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    _benchmark()
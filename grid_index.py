@@ -0,0 +1,320 @@
+""" Uniform grid spatial hash: points bucketed by the cube of space they fall in. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from itertools import product
+from typing import Generic, Iterable, Iterator, Tuple, TypeVar
+
+from heap import MaxHeap
+from threedeebeetree import Point, distance_squared
+
+I = TypeVar('I')
+Cell = Tuple[int, int, int]
+
+
+class GridIndex(Generic[I]):
+    """
+    Same mapping API as ThreeDeeBeeTree, with items kept in a dict by key and
+    every key also filed under its cell, the cube of side cell_size holding
+    it. Point lookups, inserts and deletes are O(1) expected, with no tree
+    descent. Neighbourhood and box queries visit only the cells they overlap,
+    so they are cheapest when cell_size is about the size of a typical query.
+    """
+
+    def __init__(self, cell_size: int = 16) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        if cell_size <= 0:
+            raise ValueError('cell_size must be positive.')
+        self.cell_size = cell_size
+        self.points = {}
+        self.cells = {}
+        self.bounds = None  # (lowest, highest) occupied cell on each axis, None if to be recomputed
+
+    @classmethod
+    def build(cls, points_with_items: Iterable[tuple[Point, I]], cell_size: int = 16) -> GridIndex[I]:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(N), where N is the number of points
+        """
+        grid = cls(cell_size)
+        for key, item in points_with_items:
+            grid[key] = item
+        return grid
+
+    def cell_of(self, key: Point) -> Cell:
+        size = self.cell_size
+        return key[0] // size, key[1] // size, key[2] // size
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __contains__(self, key: Point) -> bool:
+        return key in self.points
+
+    def __getitem__(self, key: Point) -> I:
+        try:
+            return self.points[key]
+        except KeyError:
+            raise KeyError('Key not found: {0}'.format(key)) from None
+
+    def get(self, key: Point, default: I | None = None) -> I | None:
+        return self.points.get(key, default)
+
+    def get_many(self, keys: Iterable[Point], default: I | None = None) -> list[I | None]:
+        points = self.points
+        return [points.get(key, default) for key in keys]
+
+    def __setitem__(self, key: Point, item: I) -> None:
+        """ Inserts a new key, raising ValueError if it is already present. """
+        if key in self.points:
+            raise ValueError('Inserting duplicate item')
+        self.points[key] = item
+        cell = self.cell_of(key)
+        if cell in self.cells:
+            self.cells[cell].add(key)
+            return
+        self.cells[cell] = {key}
+        if len(self.cells) == 1:
+            self.bounds = cell, cell
+        elif self.bounds is not None:
+            low, high = self.bounds
+            self.bounds = (tuple(min(low[axis], cell[axis]) for axis in range(3)),
+                           tuple(max(high[axis], cell[axis]) for axis in range(3)))
+
+    def __delitem__(self, key: Point) -> None:
+        if key not in self.points:
+            raise KeyError('Key not found: {0}'.format(key))
+        del self.points[key]
+        cell = self.cell_of(key)
+        keys = self.cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self.cells[cell]
+            if self.bounds is not None and any(cell[axis] in (self.bounds[0][axis], self.bounds[1][axis])
+                                               for axis in range(3)):
+                self.bounds = None
+
+    def cell_bounds(self) -> tuple[Cell, Cell]:
+        """
+        The lowest and highest occupied cell on each axis. Kept up to date on
+        insert; a delete emptying a cell on the boundary leaves them to be
+        recomputed here on the next call.
+
+        Time Complexity:
+        - Worst case: O(C), where C is the number of occupied cells, after such a delete
+        - Best case: O(1)
+        """
+        if self.bounds is None:
+            cells = self.cells
+            self.bounds = (tuple(min(cell[axis] for cell in cells) for axis in range(3)),
+                           tuple(max(cell[axis] for cell in cells) for axis in range(3)))
+        return self.bounds
+
+    def __iter__(self) -> Iterator[tuple[Point, I]]:
+        return iter(self.points.items())
+
+    def _cells_in_box(self, lo: Point, hi: Point) -> Iterator[set[Point]]:
+        """
+        The occupied cells overlapping the box: every cell position in it, or
+        every occupied cell if there are fewer of those.
+
+        Time Complexity:
+        - Best case = Worst case: O(min(C, B)), where C is the number of occupied cells and B the cells in the box
+        """
+        low, high = self.cell_of(lo), self.cell_of(hi)
+        spans = [high[axis] - low[axis] + 1 for axis in range(3)]
+        if min(spans) <= 0:
+            return
+        if spans[0] * spans[1] * spans[2] <= len(self.cells):
+            for cell in product(*(range(low[axis], high[axis] + 1) for axis in range(3))):
+                if cell in self.cells:
+                    yield self.cells[cell]
+        else:
+            for cell, keys in self.cells.items():
+                if all(low[axis] <= cell[axis] <= high[axis] for axis in range(3)):
+                    yield keys
+
+    def range_query(self, lo: Point, hi: Point) -> Iterator[tuple[Point, I]]:
+        """
+        Yields the (key, item) pairs with lo <= key <= hi on every axis.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of points
+        - Best case: O(B + K), where B is the number of cells in the box and K the keys in those cells
+        """
+        points = self.points
+        for keys in self._cells_in_box(lo, hi):
+            for key in keys:
+                if lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]:
+                    yield key, points[key]
+
+    def count_in_box(self, lo: Point, hi: Point) -> int:
+        return sum(1 for _ in self.range_query(lo, hi))
+
+    def neighbourhood(self, point: Point, distance: int = 1) -> Iterator[tuple[Point, I]]:
+        """ Yields the (key, item) pairs within distance of point on every axis, point included. """
+        lo = (point[0] - distance, point[1] - distance, point[2] - distance)
+        hi = (point[0] + distance, point[1] + distance, point[2] + distance)
+        return self.range_query(lo, hi)
+
+    def within_radius(self, point: Point, radius: float) -> Iterator[tuple[Point, I]]:
+        """ Yields the (key, item) pairs whose key is within euclidean distance radius of point. """
+        r_squared = radius * radius
+        reach = int(radius) + 1
+        for key, item in self.neighbourhood(point, reach):
+            if distance_squared(key, point) <= r_squared:
+                yield key, item
+
+    def nearest(self, point: Point, k: int = 1) -> list[tuple[Point, I]]:
+        """
+        The k (key, item) pairs closest to point, nearest first.
+
+        Cells are visited in shells of growing Chebyshev distance from the cell
+        of point, clipped to the occupied cell bounds, from the first shell
+        reaching them to the last. Keys in shell r are at least
+        (r - 1) * cell_size away, so the search stops once that exceeds the kth
+        best distance found. As in _cells_in_box, once the cell positions
+        visited would outnumber the occupied cells, the remaining occupied
+        cells are scanned instead, nearest first.
+
+        Time Complexity:
+        - Worst case: O(C*log(C) + N*log(k)), where C is the number of occupied cells and N the number of points
+        - Best case: O(K*log(k)), where K is the number of keys in the cells around point
+        """
+        if k <= 0 or not self.points:
+            return []
+        centre = self.cell_of(point)
+        low, high = self.cell_bounds()
+        first = max(max(low[axis] - centre[axis], centre[axis] - high[axis], 0) for axis in range(3))
+        last = max(max(centre[axis] - low[axis], high[axis] - centre[axis]) for axis in range(3))
+        best = MaxHeap(k)  # (distance, key, item), furthest on top
+        visited = 0
+        for shell in range(first, last + 1):
+            if len(best) == k and ((shell - 1) * self.cell_size) ** 2 > best.the_array[1][0]:
+                break
+            size = self._cells_within(centre, shell, low, high) - self._cells_within(centre, shell - 1, low, high)
+            visited += size
+            if visited > len(self.cells):
+                self._scan_cells(point, centre, shell, best, k)
+                break
+            for cell in self._shell(centre, shell, low, high):
+                for key in self.cells.get(cell, ()):
+                    self._offer(best, k, point, key)
+
+        result = []
+        while len(best) > 0:
+            _, key, item = best.get_max()
+            result.append((key, item))
+        result.reverse()
+        return result
+
+    def _offer(self, best: MaxHeap, k: int, point: Point, key: Point) -> None:
+        """ Keeps key among the k best found so far if it is nearer than the furthest of them. """
+        distance = distance_squared(key, point)
+        if len(best) < k:
+            best.add((distance, key, self.points[key]))
+        elif distance < best.the_array[1][0]:
+            best.get_max()
+            best.add((distance, key, self.points[key]))
+
+    def _scan_cells(self, point: Point, centre: Cell, shell: int, best: MaxHeap, k: int) -> None:
+        """
+        Offers the keys of every occupied cell at Chebyshev distance shell or
+        more from centre, by increasing distance of the cell from point,
+        until the cells left are all further than the kth best key.
+
+        Time Complexity:
+        - Best case = Worst case: O(C*log(C) + N*log(k)), where C is the number of occupied cells
+        """
+        size = self.cell_size
+        candidates = []
+        for cell, keys in self.cells.items():
+            if max(abs(cell[axis] - centre[axis]) for axis in range(3)) >= shell:
+                gaps = (max(cell[axis] * size - point[axis], point[axis] - (cell[axis] + 1) * size, 0)
+                        for axis in range(3))
+                candidates.append((sum(gap * gap for gap in gaps), cell))
+        candidates.sort()
+        for bound, cell in candidates:
+            if len(best) == k and bound > best.the_array[1][0]:
+                break
+            for key in self.cells[cell]:
+                self._offer(best, k, point, key)
+
+    @staticmethod
+    def _cells_within(centre: Cell, shell: int, low: Cell, high: Cell) -> int:
+        """ Number of cells within Chebyshev distance shell of centre, and within the cells from low to high. """
+        if shell < 0:
+            return 0
+        count = 1
+        for axis in range(3):
+            count *= max(0, min(centre[axis] + shell, high[axis]) - max(centre[axis] - shell, low[axis]) + 1)
+        return count
+
+    @staticmethod
+    def _shell(centre: Cell, shell: int, low: Cell, high: Cell) -> Iterator[Cell]:
+        """ Cells at exactly Chebyshev distance shell from centre, within the cells from low to high. """
+        if shell == 0:
+            yield centre
+            return
+        cx, cy, cz = centre
+        z_span = range(max(-shell, low[2] - cz), min(shell, high[2] - cz) + 1)
+        z_faces = [dz for dz in (-shell, shell) if low[2] <= cz + dz <= high[2]]
+        for dx in range(max(-shell, low[0] - cx), min(shell, high[0] - cx) + 1):
+            for dy in range(max(-shell, low[1] - cy), min(shell, high[1] - cy) + 1):
+                for dz in z_span if abs(dx) == shell or abs(dy) == shell else z_faces:
+                    yield cx + dx, cy + dy, cz + dz
+
+
+def _benchmark() -> None:
+    import random
+    import time
+    from linear_octree import LinearOctree
+    from threedeebeetree import ThreeDeeBeeTree
+
+    n = 10 ** 5
+    rng = random.Random(47)
+    distributions = {
+        'uniform': lambda: tuple(rng.randrange(1000) for _ in range(3)),
+        'clustered': lambda: tuple(int(rng.gauss(500 + 200 * rng.randrange(-1, 2), 30)) for _ in range(3)),
+        'dense grid': None,
+    }
+    for name, draw in distributions.items():
+        if draw is None:
+            points = [(x, y, z) for x in range(46) for y in range(46) for z in range(46)]
+            rng.shuffle(points)
+        else:
+            points = list(dict.fromkeys(draw() for _ in range(n)))
+        pairs = [(point, i) for i, point in enumerate(points)]
+        queries = rng.sample(points, min(len(points), n // 2)) + [(-1, -1, -1)] * (n // 2)
+        boxes = []
+        for _ in range(500):
+            corner = rng.choice(points)
+            boxes.append((corner, tuple(c + 10 for c in corner)))
+
+        print('{0} ({1:,} points)'.format(name, len(points)))
+        for index_name, make in (('ThreeDeeBeeTree', ThreeDeeBeeTree), ('LinearOctree', LinearOctree),
+                                 ('GridIndex', GridIndex)):
+            index = make()
+            start = time.perf_counter()
+            for key, item in pairs:
+                index[key] = item
+            inserted = time.perf_counter()
+            for query in queries:
+                query in index
+            looked_up = time.perf_counter()
+            for lo, hi in boxes:
+                for _ in index.range_query(lo, hi):
+                    pass
+            done = time.perf_counter()
+            print('  {0:>16}: insert {1:6.2f}s, {2:,} lookups {3:6.2f}s, {4} boxes {5:6.2f}s'.format(
+                index_name, inserted - start, len(queries), looked_up - inserted, len(boxes), done - looked_up))
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -20,6 +20,17 @@ class MaxHeap(Generic[T]):
     def is_full(self) -> bool:
         return self.length + 1 == len(self.the_array)
 
+    def grow(self) -> None:
+        """
+        Doubles the capacity. The array is already in heap order, so the
+        elements are copied across as they are.
+        :complexity: O(N) where N is the number of elements
+        """
+        bigger = ArrayR(2 * len(self.the_array))
+        for i in range(1, self.length + 1):
+            bigger[i] = self.the_array[i]
+        self.the_array = bigger
+
     def rise(self, k: int) -> None:
         """
         Rise element at index k to its correct position
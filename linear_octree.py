@@ -0,0 +1,246 @@
+""" Linear octree: points kept in one array sorted by their Morton (Z-order) code. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from bisect import bisect_left
+from typing import Generic, Iterable, Iterator, TypeVar
+
+from morton import Point, min_corner, morton_encode, spread_bits
+
+I = TypeVar('I')
+
+
+def _lower_axis_bits(bit: int) -> int:
+    """ Mask of the bits below bit which belong to the same axis as it. """
+    return spread_bits((1 << (bit // 3)) - 1) << (bit % 3)
+
+
+def next_in_box(code: int, low: int, high: int) -> int | None:
+    """
+    The smallest Morton code greater than code whose point lies in the box
+    with corner codes low and high, or None if there is none (BIGMIN of
+    Tropf and Herzog). code must itself lie outside the box, between low
+    and high.
+
+    Time Complexity:
+    - Best case = Worst case: O(B), where B is the number of bits in high
+    """
+    best = None
+    for bit in range(high.bit_length() - 1, -1, -1):
+        mask = 1 << bit
+        state = (code & mask != 0, low & mask != 0, high & mask != 0)
+        if state == (False, False, True):
+            lower = _lower_axis_bits(bit)
+            best = (low | mask) & ~lower
+            high = (high & ~mask) | lower
+        elif state == (False, True, True):
+            return low
+        elif state == (True, False, False):
+            return best
+        elif state == (True, False, True):
+            low = (low | mask) & ~_lower_axis_bits(bit)
+    return best
+
+
+class LinearOctree(Generic[I]):
+    """
+    Same mapping API as ThreeDeeBeeTree, for integer points, backed by three
+    parallel lists sorted by Morton code: the codes, the keys and the items.
+    Codes are taken relative to offset, the smallest corner seen so far, so
+    negative coordinates work; inserting below it re-encodes every point.
+
+    Lookups are a binary search. A box query scans the codes between those of
+    its two corners and, whenever it leaves the box, binary searches forward
+    to the next code inside it. Inserts and deletes shift the lists, so the
+    structure suits indexes that are built once and then mostly queried.
+    """
+
+    def __init__(self) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        self.codes = []
+        self.keys = []
+        self.items = []
+        self.offset = None
+
+    @classmethod
+    def build(cls, points_with_items: Iterable[tuple[Point, I]]) -> LinearOctree[I]:
+        """
+        Builds the index from (point, item) pairs with a single sort.
+
+        Time Complexity:
+        - Best case = Worst case: O(N*log(N)), where N is the number of points
+        """
+        octree = cls()
+        pairs = list(points_with_items)
+        if pairs:
+            octree._encode(pairs, min_corner(pair[0] for pair in pairs))
+        return octree
+
+    def _encode(self, pairs: list[tuple[Point, I]], offset: Point) -> None:
+        """ Replaces the contents with pairs, sorted by their codes relative to offset. """
+        coded = sorted((morton_encode(pair[0], offset), i) for i, pair in enumerate(pairs))
+        for a, b in zip(coded, coded[1:]):
+            if a[0] == b[0]:
+                raise ValueError('Inserting duplicate item')
+        self.offset = offset
+        self.codes = [code for code, _ in coded]
+        self.keys = [pairs[i][0] for _, i in coded]
+        self.items = [pairs[i][1] for _, i in coded]
+
+    def _code(self, key: Point) -> int | None:
+        """ Code of key, or None if key lies below the offset and so cannot be stored. """
+        offset = self.offset
+        if offset is None or key[0] < offset[0] or key[1] < offset[1] or key[2] < offset[2]:
+            return None
+        return morton_encode(key, offset)
+
+    def _index(self, key: Point) -> int | None:
+        """
+        Position of key in the lists, or None.
+
+        Time Complexity:
+        - Best case = Worst case: O(log(N)), where N is the number of points
+        """
+        code = self._code(key)
+        if code is None:
+            return None
+        i = bisect_left(self.codes, code)
+        if i < len(self.codes) and self.codes[i] == code:
+            return i
+        return None
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, key: Point) -> bool:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(log(N)), where N is the number of points
+        """
+        return self._index(key) is not None
+
+    def __getitem__(self, key: Point) -> I:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(log(N)), where N is the number of points
+        """
+        i = self._index(key)
+        if i is None:
+            raise KeyError('Key not found: {0}'.format(key))
+        return self.items[i]
+
+    def get(self, key: Point, default: I | None = None) -> I | None:
+        i = self._index(key)
+        return default if i is None else self.items[i]
+
+    def get_many(self, keys: Iterable[Point], default: I | None = None) -> list[I | None]:
+        return [self.get(key, default) for key in keys]
+
+    def __setitem__(self, key: Point, item: I) -> None:
+        """
+        Inserts a new key, raising ValueError if it is already present.
+
+        Time Complexity:
+        - Worst case: O(N*log(N)), where N is the number of points, when key lies below the offset
+        - Best case: O(N), shifting the lists after a binary search
+        """
+        code = self._code(key)
+        if code is None:
+            pairs = list(zip(self.keys, self.items)) + [(key, item)]
+            self._encode(pairs, min_corner(pair[0] for pair in pairs))
+            return
+        i = bisect_left(self.codes, code)
+        if i < len(self.codes) and self.codes[i] == code:
+            raise ValueError('Inserting duplicate item')
+        self.codes.insert(i, code)
+        self.keys.insert(i, key)
+        self.items.insert(i, item)
+
+    def __delitem__(self, key: Point) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(N), where N is the number of points
+        """
+        i = self._index(key)
+        if i is None:
+            raise KeyError('Key not found: {0}'.format(key))
+        del self.codes[i], self.keys[i], self.items[i]
+
+    def __iter__(self) -> Iterator[tuple[Point, I]]:
+        """ Yields every (key, item) pair in Morton order. """
+        return zip(self.keys, self.items)
+
+    def _box_indices(self, lo: Point, hi: Point) -> Iterator[int]:
+        """
+        Positions of the keys with lo <= key <= hi on every axis, in Morton order.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of points
+        - Best case: O(log(N) + K), where K is the number of keys in the box, when the box is Morton aligned
+        """
+        offset = self.offset
+        if offset is None or any(hi[axis] < offset[axis] or hi[axis] < lo[axis] for axis in range(3)):
+            return
+        lo = tuple(max(lo[axis], offset[axis]) for axis in range(3))
+        low, high = morton_encode(lo, offset), morton_encode(hi, offset)
+        codes, keys = self.codes, self.keys
+        i = bisect_left(codes, low)
+        while i < len(codes) and codes[i] <= high:
+            key = keys[i]
+            if lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]:
+                yield i
+                i += 1
+            else:
+                code = next_in_box(codes[i], low, high)
+                if code is None:
+                    return
+                i = bisect_left(codes, code, i + 1)
+
+    def range_query(self, lo: Point, hi: Point) -> Iterator[tuple[Point, I]]:
+        """ Yields the (key, item) pairs with lo <= key <= hi on every axis, in Morton order. """
+        for i in self._box_indices(lo, hi):
+            yield self.keys[i], self.items[i]
+
+    def count_in_box(self, lo: Point, hi: Point) -> int:
+        """ Number of keys with lo <= key <= hi on every axis. """
+        return sum(1 for _ in self._box_indices(lo, hi))
+
+
+def _benchmark() -> None:
+    import random
+    import time
+    from threedeebeetree import ThreeDeeBeeTree
+
+    for side in (20, 50, 100):
+        points = [(x, y, z) for x in range(side) for y in range(side) for z in range(side)]
+        random.Random(side).shuffle(points)
+        pairs = [(point, i) for i, point in enumerate(points)]
+        queries = random.Random(0).sample(points, min(len(points), 10 ** 5))
+        boxes = []
+        for _ in range(200):
+            corner = random.Random(len(boxes)).choice(points)
+            boxes.append((corner, tuple(c + side // 10 for c in corner)))
+
+        for name, build in (('ThreeDeeBeeTree', ThreeDeeBeeTree.build_balanced), ('LinearOctree', LinearOctree.build)):
+            start = time.perf_counter()
+            index = build(pairs)
+            built = time.perf_counter()
+            for query in queries:
+                index[query]
+            looked_up = time.perf_counter()
+            for lo, hi in boxes:
+                for _ in index.range_query(lo, hi):
+                    pass
+            done = time.perf_counter()
+            print('{0:>9,} points {1:>16}: build {2:6.2f}s, {3:,} lookups {4:6.2f}s, {5} boxes {6:6.2f}s'.format(
+                len(points), name, built - start, len(queries), looked_up - built, len(boxes), done - looked_up))
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,59 @@
+""" Morton (Z-order) codes: the bits of x, y and z interleaved into one integer. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from typing import Tuple
+
+Point = Tuple[int, int, int]
+
+CHUNK_BITS = 21
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def _spread_chunk(n: int) -> int:
+    """ Moves bit i of a 21 bit number to bit 3i. """
+    n &= CHUNK_MASK
+    n = (n | n << 32) & 0x1f00000000ffff
+    n = (n | n << 16) & 0x1f0000ff0000ff
+    n = (n | n << 8) & 0x100f00f00f00f00f
+    n = (n | n << 4) & 0x10c30c30c30c30c3
+    n = (n | n << 2) & 0x1249249249249249
+    return n
+
+
+def spread_bits(n: int) -> int:
+    """
+    Moves bit i of a non-negative integer to bit 3i, 21 bits at a time.
+
+    Time Complexity:
+    - Best case = Worst case: O(B / 21), where B is the number of bits in n
+    """
+    if n < 0:
+        raise ValueError('Morton codes need non-negative coordinates.')
+    result = 0
+    shift = 0
+    while True:
+        result |= _spread_chunk(n) << shift
+        n >>= CHUNK_BITS
+        if n == 0:
+            return result
+        shift += 3 * CHUNK_BITS
+
+
+def morton_encode(point: Point, offset: Point = (0, 0, 0)) -> int:
+    """
+    Morton code of point - offset, whose coordinates must be non-negative.
+    Sorting by it keeps points that are close in space close in the order.
+
+    Time Complexity:
+    - Best case = Worst case: O(B / 21), where B is the number of bits in the largest coordinate
+    """
+    return (spread_bits(point[0] - offset[0])
+            | spread_bits(point[1] - offset[1]) << 1
+            | spread_bits(point[2] - offset[2]) << 2)
+
+
+def min_corner(points) -> Point:
+    """ Smallest coordinate of the points along each axis, to use as an offset. """
+    points = list(points)
+    return min(p[0] for p in points), min(p[1] for p in points), min(p[2] for p in points)
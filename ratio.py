@@ -1,7 +1,12 @@
 from __future__ import annotations
-from typing import Generic, TypeVar
+from collections import OrderedDict
+from typing import Callable, Generic, Iterator, TypeVar
+from itertools import islice
 from math import ceil
-from bst import BinarySearchTree
+from bst import BinarySearchTree, MultisetBinarySearchTree
+from referential_array import ArrayR
+from sketch import KLLSketch
+from time import monotonic
 
 T = TypeVar("T")
 I = TypeVar("I")
@@ -9,12 +14,25 @@ I = TypeVar("I")
 
 class Percentiles(Generic[T]):
 
-    def __init__(self) -> None:
+    def __init__(self, multiset: bool = False, cache_size: int = 0) -> None:
         """
+        With multiset, repeated points are allowed and share a single node
+        which counts them. With a cache_size, up to that many ratio results
+        are remembered until the points change.
+
         Time Complexity:
         - Best case = Worst case: O(1)
         """
-        self.bst = BinarySearchTree()
+        self.multiset = multiset
+        if multiset:
+            self.bst = MultisetBinarySearchTree()
+        else:
+            self.bst = BinarySearchTree()
+        self.version = 0
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def add_point(self, item: T):
         """
@@ -22,7 +40,11 @@ class Percentiles(Generic[T]):
         - Worst case: O(log(N) <- O(comp * d) where comp is the complexity for comparing keys, where d is the depth of the tree
         - Best case: O(comp), where comp is the complexity for comparing keys, when root is None
         """
-        self.bst[item] = 0
+        if self.multiset:
+            self.bst.add(item)
+        else:
+            self.bst[item] = 0
+        self.version += 1
 
     def remove_point(self, item: T):
         """
@@ -30,9 +52,41 @@ class Percentiles(Generic[T]):
         - Worst case: O(log(N) <- O(comp * d) where comp is the complexity for comparing keys, where d is the depth of the tree
         - Best case: O(comp), where comp is the complexity for comparing keys, when root is None
         """
-        del self.bst[item]
+        if self.multiset:
+            self.bst.remove(item)
+        else:
+            del self.bst[item]
+        self.version += 1
 
     def ratio(self, x, y) -> list[T]:
+        """
+        With a cache, a result is reused until the next add_point or remove_point,
+        evicting the least recently used (x, y) when the cache is full. Cached
+        lists are shared between calls, so they should not be modified.
+
+        Time Complexity:
+        - Worst case: O(log(N)+O) where O is the number of points returned by the function
+        - Best case = O(1), when the result is cached or x+y is bigger equal than 100
+        """
+        if self.cache_size <= 0:
+            return self.ratio_aux(x, y)
+
+        key = (x, y)
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] == self.version:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            return entry[1]
+
+        self.cache_misses += 1
+        result = self.ratio_aux(x, y)
+        self.cache[key] = (self.version, result)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def ratio_aux(self, x, y) -> list[T]:
         """
         Time Complexity:
         - Worst case: O(log(N)+O) where O is the number of points returned by the function
@@ -45,11 +99,314 @@ class Percentiles(Generic[T]):
         n_nodes = self.bst.root.subtree_size
         lower_bound = ceil(n_nodes * x / 100) + 1
         upper_bound = n_nodes - ceil(n_nodes * y / 100)
+        if lower_bound > upper_bound:
+            return []
 
         lower = self.bst.kth_smallest(lower_bound, self.bst.root).key
         upper = self.bst.kth_smallest(upper_bound, self.bst.root).key
 
-        return self.bst.sorted_splice(lower, upper)
+        if not self.multiset:
+            return self.bst.sorted_splice(lower, upper)
+
+        # Copies of the boundary values may fall outside the wanted ranks.
+        elements = self.bst.sorted_splice(lower, upper)
+        skip_front = lower_bound - self.bst.count_less(lower) - 1
+        skip_back = self.bst.count_less_equal(upper) - upper_bound
+        return elements[skip_front:len(elements) - skip_back]
+
+    def iter_ratio(self, x, y) -> Iterator[T]:
+        """
+        Generator version of ratio, yielding the same points in increasing order.
+
+        Time Complexity:
+        - Worst case: O(log(N)+O) over the whole iteration, where O is the number of points yielded
+        - Best case = O(1), no operation needed when x+y is bigger equal than 100 or there are no points
+        """
+        if x + y >= 100 or self.bst.root is None:
+            return iter(())
+
+        n_nodes = self.bst.root.subtree_size
+        lower_bound = ceil(n_nodes * x / 100) + 1
+        upper_bound = n_nodes - ceil(n_nodes * y / 100)
+        if lower_bound > upper_bound:
+            return iter(())
+
+        lower, upper = self.select_ranks([lower_bound, upper_bound])
+        skip_front = 0
+        if self.multiset:
+            skip_front = lower_bound - self.bst.count_less(lower) - 1
+        points = self.bst.iter_splice(lower, upper)
+        return islice(points, skip_front, skip_front + upper_bound - lower_bound + 1)
+
+    def quantile(self, q: float) -> T:
+        """
+        The nearest-rank q-th percentile, 0 <= q <= 100: the smallest point with
+        at least q% of the points less than or equal to it.
+
+        Time Complexity:
+        - Worst case: O(D) where D is the depth of the tree
+        - Best case: O(1), when the point is at the root
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: list[float]) -> list[T]:
+        """
+        Several quantiles at once, in the order of qs. The ranks are looked up
+        in a single descent which only splits where their paths diverge.
+
+        Time Complexity:
+        - Worst case: O(Q * D) where Q is len(qs) and D the depth of the tree
+        - Best case: O(Q * log(Q) + D), when the quantiles share most of their path
+        """
+        if self.bst.root is None:
+            raise IndexError
+        n_points = self.bst.root.subtree_size
+        ranks = [max(1, ceil(n_points * q / 100)) for q in qs]
+        return self.select_ranks(ranks)
+
+    def select_ranks(self, ranks: list[int]) -> list[T]:
+        """
+        Points of the given 1-based ranks, in the order of ranks.
+
+        Time Complexity:
+        - Worst case: O(R * D) where R is len(ranks) and D the depth of the tree
+        - Best case: O(R * log(R) + D), when the ranks share most of their path
+        """
+        order = sorted(range(len(ranks)), key=ranks.__getitem__)
+        result = [None] * len(ranks)
+        # Each stack entry is a subtree, the rank offset of its first point,
+        # and a sorted run of indices into ranks which fall inside it.
+        stack = [(self.bst.root, 0, order)]
+        while stack:
+            current, offset, wanted = stack.pop()
+            left_size = current.left.subtree_size if current.left is not None else 0
+            here_end = offset + left_size + self.bst.copies(current)
+            left, right = [], []
+            for i in wanted:
+                if ranks[i] <= offset + left_size:
+                    left.append(i)
+                elif ranks[i] <= here_end:
+                    result[i] = current.key
+                else:
+                    right.append(i)
+            if left:
+                stack.append((current.left, offset, left))
+            if right:
+                if current.right is None:
+                    raise IndexError
+                stack.append((current.right, here_end, right))
+        return result
+
+    def count_between(self, low: T, high: T) -> int:
+        """
+        Number of points p with low <= p <= high.
+
+        Time Complexity:
+        - Best case = Worst case: O(D) where D is the depth of the tree
+        """
+        if high < low:
+            return 0
+        return self.bst.count_less_equal(high) - self.bst.count_less(low)
+
+
+class SketchPercentiles(Generic[T]):
+    """
+    Percentiles backed by a KLL sketch rather than a tree: memory stays
+    bounded on unbounded streams, at the price of answers whose ranks are
+    only approximately right. A sketch cannot forget a point it has
+    summarised, so there is no remove_point.
+    """
+
+    def __init__(self, k: int = 200, seed: int | None = None) -> None:
+        """
+        Larger k means more memory and a smaller error, about 3.3 / k in rank.
+
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        self.sketch = KLLSketch(k, seed)
+
+    @classmethod
+    def for_error(cls, epsilon: float, seed: int | None = None) -> SketchPercentiles:
+        percentiles = cls()
+        percentiles.sketch = KLLSketch.for_error(epsilon, seed)
+        return percentiles
+
+    def __len__(self) -> int:
+        return len(self.sketch)
+
+    def add_point(self, item: T):
+        """
+        Time Complexity:
+        - Worst case: O(k * log(k)), when a compactor has to be sorted
+        - Best case: O(1)
+        """
+        self.sketch.add(item)
+
+    def merge(self, other: SketchPercentiles) -> None:
+        """ Combines the points summarised by other, e.g. from another worker, into self. """
+        self.sketch.merge(other.sketch)
+
+    def ratio(self, x, y) -> list[T]:
+        """
+        The retained sample points between the estimated cut-offs. They stand in
+        for the real points, which the sketch no longer holds.
+
+        Time Complexity:
+        - Best case = Worst case: O(k * log(k))
+        """
+        n_points = len(self.sketch)
+        if x + y >= 100 or n_points == 0:
+            return []
+        lower_bound = ceil(n_points * x / 100) + 1
+        upper_bound = n_points - ceil(n_points * y / 100)
+        if lower_bound > upper_bound:
+            return []
+        lower, upper = self.sketch.quantiles([lower_bound, upper_bound])
+        return [item for item, _ in self.sketch.weighted_items() if lower <= item <= upper]
+
+    def quantile(self, q: float) -> T:
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: list[float]) -> list[T]:
+        """
+        Estimated nearest-rank quantiles, in the order of qs.
+
+        Time Complexity:
+        - Best case = Worst case: O(k * log(k) + Q * log(Q)), where Q is len(qs)
+        """
+        n_points = len(self.sketch)
+        return self.sketch.quantiles([max(1, ceil(n_points * q / 100)) for q in qs])
+
+    def count_between(self, low: T, high: T) -> int:
+        """ Estimated number of points p with low <= p <= high. """
+        if high < low:
+            return 0
+        return sum(weight for item, weight in self.sketch.weighted_items() if low <= item <= high)
+
+
+class WindowedPercentiles(Percentiles[T]):
+    """
+    Percentiles over the last max_points points and/or the points added in the
+    last max_age seconds of clock. Arrivals are kept in a ring buffer, oldest
+    first, and expired points are removed from the tree from its front.
+    Repeated points are allowed, as in multiset mode.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, max_points: int | None = None, max_age: float | None = None,
+                 clock: Callable[[], float] = monotonic) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(max_points), or O(1) without max_points, to create the ring buffer
+        """
+        if max_points is None and max_age is None:
+            raise ValueError('A window needs max_points or max_age.')
+        super().__init__(multiset=True)
+        self.max_points = max_points
+        self.max_age = max_age
+        self.clock = clock
+        self.ring = ArrayR(max_points if max_points is not None else self.INITIAL_CAPACITY)
+        self.times = ArrayR(len(self.ring))
+        self.start = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        self.expire()
+        return self.count
+
+    def add_point(self, item: T):
+        """
+        Time Complexity:
+        - Worst case: O(E * log(N)), where E is the number of points expiring and N the window size
+        - Best case: O(log(N)), amortised over the expired points
+        """
+        now = self.clock()
+        if self.max_points is not None and self.count == self.max_points:
+            self.evict_oldest()
+        self.expire(now)
+        if self.count == len(self.ring):
+            self.grow()
+        end = (self.start + self.count) % len(self.ring)
+        self.ring[end] = item
+        self.times[end] = now
+        self.count += 1
+        super().add_point(item)
+
+    def remove_point(self, item: T):
+        """
+        Removes the oldest copy of item still in the window, closing the gap
+        it leaves in the ring buffer. Raises ValueError if there is none.
+
+        Time Complexity:
+        - Worst case: O(W + log(N)), where W is the number of points in the window and N the window size
+        - Best case: O(log(N)), when item is the oldest point
+        """
+        self.expire()
+        capacity = len(self.ring)
+        for i in range(self.count):
+            if self.ring[(self.start + i) % capacity] == item:
+                break
+        else:
+            raise ValueError('Deleting non-existent item')
+        for j in range(i, self.count - 1):
+            here, after = (self.start + j) % capacity, (self.start + j + 1) % capacity
+            self.ring[here] = self.ring[after]
+            self.times[here] = self.times[after]
+        self.ring[(self.start + self.count - 1) % capacity] = None
+        self.count -= 1
+        super().remove_point(item)
+
+    def expire(self, now: float | None = None) -> int:
+        """
+        Removes every point older than max_age in one batch, returning how many.
+
+        Time Complexity:
+        - Worst case: O(E * log(N)), where E is the number of expired points and N the window size
+        - Best case: O(1), when nothing has expired or there is no max_age
+        """
+        if self.max_age is None:
+            return 0
+        cutoff = (self.clock() if now is None else now) - self.max_age
+        expired = 0
+        while self.count > 0 and self.times[self.start] <= cutoff:
+            self.evict_oldest()
+            expired += 1
+        return expired
+
+    def evict_oldest(self) -> None:
+        item = self.ring[self.start]
+        self.ring[self.start] = None
+        self.start = (self.start + 1) % len(self.ring)
+        self.count -= 1
+        super().remove_point(item)
+
+    def grow(self) -> None:
+        """ Doubles the ring buffer, unwrapping it so the oldest point is first. """
+        ring, times = ArrayR(2 * len(self.ring)), ArrayR(2 * len(self.ring))
+        for i in range(self.count):
+            ring[i] = self.ring[(self.start + i) % len(self.ring)]
+            times[i] = self.times[(self.start + i) % len(self.ring)]
+        self.ring, self.times, self.start = ring, times, 0
+
+    def ratio(self, x, y) -> list[T]:
+        self.expire()
+        if self.count == 0:
+            return []
+        return super().ratio(x, y)
+
+    def iter_ratio(self, x, y) -> Iterator[T]:
+        self.expire()
+        return super().iter_ratio(x, y)
+
+    def quantiles(self, qs: list[float]) -> list[T]:
+        self.expire()
+        return super().quantiles(qs)
+
+    def count_between(self, low: T, high: T) -> int:
+        self.expire()
+        return super().count_between(low, high)
 
 
 if __name__ == "__main__":
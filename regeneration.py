@@ -0,0 +1,190 @@
+""" Beehive selection where hives refill over time and are re-evaluated lazily. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+from time import monotonic
+from typing import Callable
+
+from beehive import Beehive
+from heap import MaxHeap
+
+
+class RegenEntry:
+    """ A hive with its regeneration rate and the time its volume was last brought up to date. """
+
+    def __init__(self, hive: Beehive, rate: float, last_updated: float) -> None:
+        self.hive = hive
+        self.rate = rate
+        self.last_updated = last_updated
+        self.version = 0
+
+    def value(self) -> float:
+        """ Emeralds this hive would give at last_updated. """
+        return self.hive.value()
+
+    def value_at(self, now: float) -> float:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        return self.hive.value(self.hive.volume + self.rate * (now - self.last_updated))
+
+    def regenerate(self, now: float) -> None:
+        self.hive.volume += self.rate * (now - self.last_updated)
+        self.last_updated = now
+
+    def crossing_time(self, threshold: float) -> float | None:
+        """
+        The value goes above threshold for every time strictly after the
+        returned one. None if it never will.
+
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        hive = self.hive
+        if self.value() > threshold:
+            return float('-inf')
+        if self.rate <= 0 or hive.nutrient_factor * hive.capacity <= threshold:
+            return None
+        needed = max(0, threshold / hive.nutrient_factor - hive.volume)
+        return self.last_updated + needed / self.rate
+
+
+class RegeneratingBeehiveSelector:
+    """
+    BeehiveSelector whose hives regain volume at a per-hive rate.
+
+    Volumes are only brought up to date lazily: when a hive reaches the top of
+    the heap, or when a scheduler event says its value has crossed the value of
+    the top hive it was compared against. Each scheduled hive remembers that
+    threshold; when a harvest lowers the top below it the hive is rescheduled,
+    so only hives that could now beat the top are ever re-prioritised.
+    """
+
+    def __init__(self, max_beehives: int, clock: Callable[[], float] = monotonic) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(max_beehives), create the heaps
+        """
+        self.max_beehives = max_beehives
+        self.clock = clock
+        self.size = 0
+        self.seq = 0
+        self.top_value = 0
+        self.beehives = MaxHeap(max_beehives)   # (value, seq, entry, version)
+        self.events = MaxHeap(max_beehives)     # (-crossing time, seq, entry, version)
+        self.thresholds = MaxHeap(max_beehives) # (threshold, seq, entry, version)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def set_all_beehives(self, hive_list: list[Beehive], rates: list[float] | None = None,
+                         now: float | None = None) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(M * log(M)), where M is the len(hive_list)
+        """
+        self.__init__(self.max_beehives, self.clock)
+        now = self._now(now)
+        for i, hive in enumerate(hive_list):
+            self.add_beehive(hive, 0 if rates is None else rates[i], now)
+
+    def add_beehive(self, hive: Beehive, rate: float = 0, now: float | None = None) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(log(N)), where N is the number of hives
+        """
+        if self.size >= self.max_beehives:
+            raise IndexError
+        self.size += 1
+        self._reinsert(RegenEntry(hive, rate, self._now(now)))
+
+    def harvest_best_beehive(self, now: float | None = None) -> float:
+        """
+        Time Complexity:
+        - Worst case: O(R * log(N)), where R is the number of hives whose value crossed the top
+          since the last harvest and N the number of hives
+        - Best case: O(log(N)), when no hive has to be re-prioritised
+        """
+        now = self._now(now)
+        entry = self._settle(now)
+        entry.regenerate(now)
+        hive = entry.hive
+        quantity = min(hive.volume, hive.capacity)
+        hive.volume -= quantity
+        self._reinsert(entry)
+        return quantity * hive.nutrient_factor
+
+    def _settle(self, now: float) -> RegenEntry:
+        """
+        Brings every hive that may beat the top up to date and returns the best one.
+        """
+        if self.size == 0:
+            raise IndexError
+        while True:
+            # Hives whose value crossed the threshold they were scheduled against.
+            while len(self.events) > 0 and -self.events.the_array[1][0] < now:
+                _, _, entry, version = self.events.get_max()
+                if version == entry.version:
+                    self._refresh(entry, now)
+
+            # Refresh the top until it is up to date.
+            while True:
+                _, _, entry, version = self.beehives.the_array[1]
+                if version != entry.version:
+                    self.beehives.get_max()
+                elif entry.last_updated < now and entry.value_at(now) != entry.value():
+                    self._refresh(entry, now)
+                else:
+                    break
+            self.top_value = entry.value()
+
+            # Harvests only lower the top, so hives scheduled against a higher
+            # top may already beat it: reschedule them against the current one.
+            rescheduled = False
+            while len(self.thresholds) > 0 and self.thresholds.the_array[1][0] > self.top_value:
+                _, _, stale, version = self.thresholds.get_max()
+                if version == stale.version:
+                    self._schedule(stale)
+                    rescheduled = True
+            if not rescheduled:
+                return entry
+
+    def _refresh(self, entry: RegenEntry, now: float) -> None:
+        entry.regenerate(now)
+        self._reinsert(entry)
+
+    def _reinsert(self, entry: RegenEntry) -> None:
+        """ Invalidates the old heap entries of entry and pushes fresh ones. """
+        entry.version += 1
+        self.top_value = max(self.top_value, entry.value())
+        self._push('beehives', (entry.value(), self._next_seq(), entry, entry.version))
+        self._schedule(entry)
+
+    def _schedule(self, entry: RegenEntry) -> None:
+        crossing = entry.crossing_time(self.top_value)
+        if crossing is not None:
+            self._push('events', (-crossing, self._next_seq(), entry, entry.version))
+        self._push('thresholds', (self.top_value, self._next_seq(), entry, entry.version))
+
+    def _push(self, name: str, item: tuple) -> None:
+        """
+        Adds item to one of the heaps. A full heap is rebuilt without its stale
+        entries, doubling its size if needed.
+        """
+        heap = getattr(self, name)
+        if heap.is_full():
+            live = [heap.the_array[i] for i in range(1, len(heap) + 1)
+                    if heap.the_array[i][3] == heap.the_array[i][2].version]
+            heap = MaxHeap(max(self.max_beehives, 2 * len(live) + 1))
+            for old in live:
+                heap.add(old)
+            setattr(self, name, heap)
+        heap.add(item)
+
+    def _next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def _now(self, now: float | None) -> float:
+        return self.clock() if now is None else now
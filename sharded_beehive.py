@@ -0,0 +1,208 @@
+""" Beehive selection spread over several worker processes. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+import os
+from array import array
+from multiprocessing import Pipe, Process, resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+from beehive import Beehive
+from heap import MaxHeap
+
+FIELDS = 6  # x, y, z, capacity, nutrient_factor, volume
+
+
+def _hive_fields(hive: Beehive) -> list[int]:
+    return [hive.x, hive.y, hive.z, hive.capacity, hive.nutrient_factor, hive.volume]
+
+
+def _shard_max(heap: MaxHeap) -> int | None:
+    if len(heap) == 0:
+        return None
+    return heap.the_array[1].value()
+
+
+def _harvest(heap: MaxHeap) -> float:
+    hive = heap.get_max()
+    quantity = min(hive.volume, hive.capacity)
+    hive.volume -= quantity
+    heap.add(hive)
+    return quantity * hive.nutrient_factor
+
+
+def _shard_worker(conn: Connection, max_beehives: int) -> None:
+    """
+    Event loop of a single shard. Each shard owns its own MaxHeap and replies
+    to every command with its new maximum so the coordinator stays in sync.
+    """
+    heap = MaxHeap(max_beehives)
+    while True:
+        command, *args = conn.recv()
+        if command == 'load':
+            name, start, stop = args
+            shm = SharedMemory(name=name)
+            data = array('q')
+            try:
+                data.frombytes(shm.buf[data.itemsize * FIELDS * start:data.itemsize * FIELDS * stop])
+            finally:
+                shm.close()
+            heap = MaxHeap(max_beehives)
+            for i in range(stop - start):
+                heap.add(Beehive(*data[FIELDS * i:FIELDS * (i + 1)]))
+            conn.send(_shard_max(heap))
+        elif command == 'add':
+            heap.add(args[0])
+            conn.send(_shard_max(heap))
+        elif command == 'harvest':
+            # Keep harvesting while this shard still holds the global best,
+            # so a batch only costs one round trip per change of shard.
+            threshold, limit = args
+            results = [_harvest(heap)]
+            while len(results) < limit and (threshold is None or _shard_max(heap) >= threshold):
+                results.append(_harvest(heap))
+            conn.send((results, _shard_max(heap)))
+        elif command == 'close':
+            conn.close()
+            return
+
+
+class ShardedBeehiveSelector:
+    """
+    BeehiveSelector that partitions hives across worker processes.
+
+    The coordinator keeps a small MaxHeap of (max value, shard) pairs, one per
+    non-empty shard, so a harvest only talks to the shard holding the best hive.
+    Hives live in the workers: the Beehive objects handed in are copied and are
+    not mutated by harvesting.
+    """
+
+    def __init__(self, max_beehives: int, n_shards: int | None = None) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(S + max_beehives), where S is the number of shards
+        """
+        self.max_beehives = max_beehives
+        self.n_shards = max(1, n_shards or os.cpu_count() or 1)
+        self.connections = []
+        self.processes = []
+        # Started before the workers so that they share it: attaching to a
+        # block then does not register it with a tracker of their own, which
+        # would try to unlink it again when they exit.
+        resource_tracker.ensure_running()
+        for _ in range(self.n_shards):
+            parent, child = Pipe()
+            process = Process(target=_shard_worker, args=(child, max_beehives), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.shard_max = [None] * self.n_shards
+        self.shard_sizes = [0] * self.n_shards
+        self.maxima = MaxHeap(self.n_shards)
+
+    def __enter__(self) -> ShardedBeehiveSelector:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(self.shard_sizes)
+
+    def close(self) -> None:
+        """ Stops all worker processes. """
+        for conn, process in zip(self.connections, self.processes):
+            conn.send(('close',))
+            conn.close()
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def set_all_beehives(self, hive_list: list[Beehive]) -> None:
+        """
+        Copies the hives into one shared memory block and lets every shard build
+        its heap from its own slice in parallel.
+
+        Time Complexity:
+        - Best case = Worst case: O(M + M/S * log(M/S)) wall time, where M is the len(hive_list)
+          and S the number of shards
+        """
+        if len(hive_list) > self.max_beehives * self.n_shards:
+            raise IndexError
+        shm = SharedMemory(create=True, size=max(1, array('q').itemsize * FIELDS * len(hive_list)))
+        try:
+            data = array('q')
+            for hive in hive_list:
+                data.extend(_hive_fields(hive))
+            shm.buf[:len(data) * data.itemsize] = data.tobytes()
+
+            chunk = -(-len(hive_list) // self.n_shards)
+            for shard, conn in enumerate(self.connections):
+                start = min(len(hive_list), shard * chunk)
+                stop = min(len(hive_list), start + chunk)
+                self.shard_sizes[shard] = stop - start
+                conn.send(('load', shm.name, start, stop))
+            for shard, conn in enumerate(self.connections):
+                self.shard_max[shard] = conn.recv()
+        finally:
+            shm.close()
+            shm.unlink()
+        self._rebuild_maxima()
+
+    def add_beehive(self, hive: Beehive) -> None:
+        """
+        Adds the hive to the smallest shard.
+
+        Time Complexity:
+        - Worst case: O(S + log(N/S)), when the shard's maximum changes and the coordinator heap is rebuilt
+        - Best case: O(S + 1), where S is the number of shards
+        """
+        shard = min(range(self.n_shards), key=self.shard_sizes.__getitem__)
+        if self.shard_sizes[shard] >= self.max_beehives:
+            raise IndexError
+        self.connections[shard].send(('add', hive))
+        new_max = self.connections[shard].recv()
+        self.shard_sizes[shard] += 1
+        if new_max != self.shard_max[shard]:
+            self.shard_max[shard] = new_max
+            self._rebuild_maxima()
+
+    def harvest_best_beehive(self) -> float:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(log(N/S) + log(S)), where N is the number of hives and S the number of shards
+        """
+        return self.harvest_many(1)[0]
+
+    def harvest_many(self, count: int) -> list[float]:
+        """
+        Performs count consecutive harvests, in the same order as calling
+        harvest_best_beehive count times. The winning shard harvests for as
+        long as it holds the best hive before control returns here.
+
+        Time Complexity:
+        - Worst case: O(count * (log(N/S) + log(S))), when the best shard changes on every harvest
+        - Best case: O(count * log(N/S) + log(S)), when a single shard wins every harvest
+        """
+        results = []
+        while len(results) < count:
+            if len(self.maxima) == 0:
+                raise IndexError
+            _, shard = self.maxima.get_max()
+            threshold = None
+            if len(self.maxima) > 0:
+                threshold = self.maxima.the_array[1][0]
+            self.connections[shard].send(('harvest', threshold, count - len(results)))
+            batch, new_max = self.connections[shard].recv()
+            results.extend(batch)
+            self.shard_max[shard] = new_max
+            self.maxima.add((new_max, shard))
+        return results
+
+    def _rebuild_maxima(self) -> None:
+        self.maxima = MaxHeap(self.n_shards)
+        for shard in range(self.n_shards):
+            if self.shard_sizes[shard] > 0:
+                self.maxima.add((self.shard_max[shard], shard))
@@ -0,0 +1,172 @@
+""" KLL quantile sketch: approximate order statistics of a stream in bounded memory. """
+from __future__ import annotations
+__docformat__ = 'reStructuredText'
+
+import random
+from math import ceil
+from typing import Generic, TypeVar
+
+T = TypeVar('T')
+
+
+class KLLSketch(Generic[T]):
+    """
+    Karnin-Lang-Liberty sketch. Level h is a compactor holding items of weight
+    2**h; a full compactor is sorted and every other item is promoted to the
+    next level. Memory is O(k) items, and ranks are within about 3.3 / k of
+    the true normalised rank with high probability.
+    """
+
+    SHRINK = 2 / 3
+    MIN_CAPACITY = 2
+
+    def __init__(self, k: int = 200, seed: int | None = None) -> None:
+        """
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        if k < self.MIN_CAPACITY:
+            raise ValueError('k should be at least {0}.'.format(self.MIN_CAPACITY))
+        self.k = k
+        self.random = random.Random(seed)
+        self.compactors = [[]]
+        self.count = 0
+        self.size = 0
+        self.max_size = self.capacity(0)
+
+    @classmethod
+    def for_error(cls, epsilon: float, seed: int | None = None) -> KLLSketch:
+        """ A sketch whose normalised rank error is about epsilon. """
+        return cls(max(cls.MIN_CAPACITY, ceil(3.3 / epsilon)), seed)
+
+    def __len__(self) -> int:
+        """ Number of points added, not the number retained. """
+        return self.count
+
+    def capacity(self, level: int) -> int:
+        """ Compactors shrink geometrically below the top level. """
+        depth = len(self.compactors) - level - 1
+        return max(self.MIN_CAPACITY, ceil(self.k * self.SHRINK ** depth))
+
+    def add(self, item: T) -> None:
+        """
+        Time Complexity:
+        - Worst case: O(k * log(k)), when a compactor has to be sorted
+        - Best case: O(1), amortised O(log(k))
+        """
+        self.compactors[0].append(item)
+        self.count += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self.compress()
+
+    def compress(self) -> None:
+        """ Compacts the lowest full level until the sketch fits again. """
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self.capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                compactor = sorted(self.compactors[level])
+                # An odd item out stays behind so no weight is lost.
+                keep = compactor.pop() if len(compactor) % 2 else None
+                self.compactors[level + 1].extend(compactor[self.random.randint(0, 1)::2])
+                self.compactors[level] = [] if keep is None else [keep]
+                self.size = sum(len(c) for c in self.compactors)
+                self.max_size = sum(self.capacity(h) for h in range(len(self.compactors)))
+                if self.size < self.max_size:
+                    return
+
+    def merge(self, other: KLLSketch) -> None:
+        """
+        Adds every point summarised by other into this sketch. other is unchanged.
+
+        Time Complexity:
+        - Best case = Worst case: O(k * log(k))
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level].extend(compactor)
+        self.count += other.count
+        self.size = sum(len(c) for c in self.compactors)
+        self.max_size = sum(self.capacity(h) for h in range(len(self.compactors)))
+        while self.size >= self.max_size:
+            self.compress()
+
+    def weighted_items(self) -> list[tuple[T, int]]:
+        """
+        Retained items in increasing order with their weights.
+
+        Time Complexity:
+        - Best case = Worst case: O(k * log(k))
+        """
+        items = []
+        for level, compactor in enumerate(self.compactors):
+            weight = 1 << level
+            items.extend((item, weight) for item in compactor)
+        items.sort(key=lambda pair: pair[0])
+        return items
+
+    def rank(self, item: T) -> int:
+        """
+        Estimated number of points less than or equal to item.
+
+        Time Complexity:
+        - Best case = Worst case: O(k)
+        """
+        return sum((1 << level) * sum(1 for x in compactor if x <= item)
+                   for level, compactor in enumerate(self.compactors))
+
+    def quantiles(self, ranks: list[int]) -> list[T]:
+        """
+        Estimated points of the given 1-based ranks, in the order of ranks.
+
+        Time Complexity:
+        - Best case = Worst case: O(k * log(k) + R * log(R)), where R is len(ranks)
+        """
+        if self.count == 0:
+            raise IndexError
+        items = self.weighted_items()
+        order = sorted(range(len(ranks)), key=ranks.__getitem__)
+        result = [None] * len(ranks)
+        position, cumulative = 0, items[0][1]
+        for i in order:
+            while cumulative < ranks[i] and position + 1 < len(items):
+                position += 1
+                cumulative += items[position][1]
+            result[i] = items[position][0]
+        return result
+
+
+def _benchmark(n: int = 200000) -> None:
+    import tracemalloc
+    from ratio import Percentiles
+
+    data = random.Random(1).sample(range(10 * n), n)
+
+    tracemalloc.start()
+    exact = Percentiles()
+    for point in data:
+        exact.add_point(point)
+    exact_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    qs = [1, 5, 10, 25, 50, 75, 90, 95, 99]
+    truth = exact.quantiles(qs)
+    print('exact BST: {0:,} bytes'.format(exact_bytes))
+    for k in (50, 100, 200, 400, 800):
+        tracemalloc.start()
+        sketch = KLLSketch(k, seed=k)
+        for point in data:
+            sketch.add(point)
+        sketch_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        estimates = sketch.quantiles([max(1, ceil(n * q / 100)) for q in qs])
+        error = max(abs(exact.bst.count_less_equal(e) - exact.bst.count_less_equal(t)) / n
+                    for e, t in zip(estimates, truth))
+        print('KLL k={0:>4}: {1:>6,} items retained, {2:>10,} bytes, max rank error {3:.3%}'.format(
+            k, sketch.size, sketch_bytes, error))
+
+
+if __name__ == '__main__':
+    _benchmark()
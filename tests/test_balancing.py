@@ -4,7 +4,12 @@ from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
 from threedeebeetree import ThreeDeeBeeTree, BeeNode
-from balancing import make_ordering
+from balancing import iter_ordering, make_ordering, make_ordering_numpy, make_ordering_parallel
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def get_size(node):
@@ -123,4 +128,68 @@ class TestBalancing(unittest.TestCase):
             tdbt[p] = i
 
         ratio, smaller, axis = collect_worst_ratio(tdbt.root)
-        self.assertLessEqual(ratio, 7, f"Axis {axis} has ratio 1:{ratio}.")
\ No newline at end of file
+        self.assertLessEqual(ratio, 7, f"Axis {axis} has ratio 1:{ratio}.")
+
+    @timeout(20)
+    @number("4.3")
+    def test_parallel(self):
+        random.seed(5512)
+        coords = list(range(20000))
+        random.shuffle(coords)
+        points = [(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]) for i in range(5000)]
+        self.assertEqual(make_ordering_parallel(points, processes=2, threshold=100), make_ordering(points))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    @timeout(10)
+    @number("4.4")
+    def test_numpy(self):
+        random.seed(10239123)
+        coords = list(range(10000))
+        random.shuffle(coords)
+        points = [(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]) for i in range(3000)]
+
+        ordering = [tuple(int(c) for c in p) for p in make_ordering_numpy(np.array(points))]
+        self.assertEqual(ordering, make_ordering(points))
+
+        tdbt = ThreeDeeBeeTree()
+        for i, p in enumerate(ordering):
+            tdbt[p] = i
+        ratio, smaller, axis = collect_worst_ratio(tdbt.root)
+        self.assertLessEqual(ratio, 7, f"Axis {axis} has ratio 1:{ratio}.")
+
+    @timeout()
+    @number("4.5")
+    def test_iter_ordering(self):
+        random.seed(8812)
+        coords = list(range(6000))
+        random.shuffle(coords)
+        points = [(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]) for i in range(2000)]
+        original = points[:]
+
+        ordering = iter_ordering(points)
+        self.assertEqual(next(ordering), make_ordering(points)[0])
+        tdbt = ThreeDeeBeeTree()
+        for i, p in enumerate(iter_ordering(points)):
+            tdbt[p] = i
+        self.assertEqual(points, original)
+        self.assertEqual(len(tdbt), len(points))
+        ratio, smaller, axis = collect_worst_ratio(tdbt.root)
+        self.assertLessEqual(ratio, 7, f"Axis {axis} has ratio 1:{ratio}.")
+
+    @timeout()
+    @number("4.6")
+    def test_no_balanced_root(self):
+        # Every point but the first is extreme on one axis, so no point is a
+        # balanced root, and all of them lie below the first on every axis.
+        points = [(21, 21, 21)]
+        for axis in range(3):
+            for i, value in enumerate((0, 1, 2, 3, 18, 19, 20)):
+                point = [9 + i % 4, 9 + i // 4, 9 + axis]
+                point[axis] = value
+                points.append(tuple(point))
+        self.assertEqual(len(set(points)), 22)
+
+        ordering = make_ordering(points)
+        self.assertEqual(ordering[0], (21, 21, 21))
+        self.assertEqual(sorted(ordering), sorted(points))
+        self.assertEqual(make_ordering_parallel(points, threshold=18), ordering)
@@ -0,0 +1,41 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from batch_query import BatchQueryExecutor, answer
+from threedeebeetree import ThreeDeeBeeTree
+
+
+class TestBatchQuery(unittest.TestCase):
+
+    @timeout(30)
+    @number("3.17")
+    def test_batch_queries(self):
+        random.seed(50)
+        points = list({(random.randint(-100, 100), random.randint(-100, 100), random.randint(-100, 100))
+                       for _ in range(3000)})
+        tree = ThreeDeeBeeTree.build_balanced((point, str(point)) for point in points)
+        queries = [('get', point, None) for point in points[::3]] + [('get', (101, 0, 0), 'missing')]
+        for _ in range(200):
+            lo = tuple(random.randint(-110, 100) for _ in range(3))
+            hi = tuple(c + random.randint(-1, 40) for c in lo)
+            queries.append(('range', lo, hi))
+            queries.append(('count', lo, hi))
+        random.shuffle(queries)
+
+        with BatchQueryExecutor(tree, processes=2, batch_size=97) as executor:
+            results = executor.run(queries)
+            for query, result in zip(queries, results):
+                if query[0] == 'range':
+                    self.assertEqual(sorted(result), sorted(answer(tree, query)))
+                else:
+                    self.assertEqual(result, answer(tree, query))
+            self.assertEqual(len(results), len(queries))
+            self.assertEqual(executor.get_many(points[:5]), [str(point) for point in points[:5]])
+            self.assertEqual(executor.count_in_boxes([((-100,) * 3, (100,) * 3)]), [len(points)])
+            self.assertEqual(executor.run([]), [])
+            with self.assertRaises(ValueError):
+                executor.run([('nearest', (0, 0, 0))])
+        with self.assertRaises(ValueError):
+            executor.run(queries)
@@ -1,8 +1,9 @@
+import random
 import unittest
 from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
-from beehive import BeehiveSelector, Beehive
+from beehive import BeehiveSelector, Beehive, RegionalBeehiveSelector
 
 
 class TestBeehiveSelector(unittest.TestCase):
@@ -46,4 +47,62 @@ class TestBeehiveSelector(unittest.TestCase):
         ]
         self.assertEqual(len(all_emeralds), len(expected))
         for actual, ex in zip(all_emeralds, expected):
-            self.assertAlmostEqual(actual, ex, 0)
\ No newline at end of file
+            self.assertAlmostEqual(actual, ex, 0)
+
+
+class TestRegionalBeehiveSelector(unittest.TestCase):
+
+    @timeout()
+    @number("5.2")
+    def test_regional(self):
+        random.seed(4012398)
+        coords = random.sample(range(-500, 500), 300)
+        hives = [
+            Beehive(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2],
+                    capacity=random.randint(1, 50), nutrient_factor=random.randint(1, 20),
+                    volume=random.randint(0, 100))
+            for i in range(100)
+        ]
+        s = RegionalBeehiveSelector()
+        s.set_all_beehives(hives)
+
+        def value(h):
+            return h.nutrient_factor * min(h.capacity, h.volume)
+
+        lo, hi = (-200, -300, -250), (250, 100, 300)
+        for _ in range(20):
+            in_box = [h for h in hives if all(lo[i] <= (h.x, h.y, h.z)[i] <= hi[i] for i in range(3))]
+            expected = max(value(h) for h in in_box)
+            self.assertEqual(s.harvest_best_beehive_in_box(lo, hi), expected)
+
+        centre, radius = (0, 0, 0), 400
+        for _ in range(20):
+            in_ball = [h for h in hives if h.x ** 2 + h.y ** 2 + h.z ** 2 <= radius ** 2]
+            expected = max(value(h) for h in in_ball)
+            self.assertEqual(s.harvest_best_beehive_in_radius(centre, radius), expected)
+
+        for _ in range(20):
+            expected = max(value(h) for h in hives)
+            self.assertEqual(s.harvest_best_beehive(), expected)
+
+        with self.assertRaises(IndexError):
+            s.harvest_best_beehive_in_box((1000, 1000, 1000), (2000, 2000, 2000))
+
+    @timeout()
+    @number("5.10")
+    def test_set_all_beehives_sorted(self):
+        hives = [Beehive(i, i, i, capacity=i % 37 + 1, nutrient_factor=i % 5 + 1, volume=i % 23)
+                 for i in range(5000)]
+        s = RegionalBeehiveSelector()
+        s.set_all_beehives(hives)
+        self.assertEqual(len(s), len(hives))
+
+        def depth(node):
+            return 0 if node is None else 1 + max(depth(child) for child in node.child)
+        # A 1:6 split per level, then a base case of at most 17, instead of a chain of 5000.
+        self.assertLessEqual(depth(s.tree.root), 60)
+
+        expected = sorted((h.nutrient_factor * min(h.capacity, h.volume) for h in hives), reverse=True)
+        self.assertEqual([s.harvest_best_beehive() for _ in range(10)], expected[:10])
+        with self.assertRaises(ValueError):
+            s.set_all_beehives([Beehive(1, 2, 3, 1, 1), Beehive(1, 2, 3, 2, 2)])
@@ -0,0 +1,73 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from beehive import Beehive, BeehiveSelector
+from beehive_loader import iter_beehives, load_beehives, top_beehives
+
+
+class TestBeehiveLoader(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(730192)
+        self.records = [
+            {'x': i, 'y': -i, 'z': 2 * i, 'capacity': random.randint(1, 40),
+             'nutrient_factor': random.randint(1, 9), 'volume': random.randint(0, 60)}
+            for i in range(200)
+        ]
+        self.dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.dir.name, 'hives.csv')
+        self.jsonl_path = os.path.join(self.dir.name, 'hives.jsonl')
+        with open(self.csv_path, 'w') as f:
+            f.write('x,y,z,capacity,nutrient_factor,volume\n')
+            for r in self.records:
+                f.write('{x},{y},{z},{capacity},{nutrient_factor},{volume}\n'.format(**r))
+        with open(self.jsonl_path, 'w') as f:
+            for r in self.records:
+                f.write(json.dumps(r) + '\n')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    @staticmethod
+    def value(r):
+        return r['nutrient_factor'] * min(r['capacity'], r['volume'])
+
+    @timeout()
+    @number("5.7")
+    def test_iter(self):
+        for path in (self.csv_path, self.jsonl_path):
+            hives = list(iter_beehives(path))
+            self.assertEqual([(h.x, h.capacity, h.volume) for h in hives],
+                             [(r['x'], r['capacity'], r['volume']) for r in self.records])
+
+    @timeout()
+    @number("5.8")
+    def test_top_n(self):
+        best = top_beehives(iter_beehives(self.jsonl_path), 15)
+        self.assertEqual(len(best), 15)
+        expected = sorted((self.value(r) for r in self.records), reverse=True)[:15]
+        self.assertEqual(sorted((h.nutrient_factor * min(h.capacity, h.volume) for h in best), reverse=True), expected)
+
+    @timeout()
+    @number("5.9")
+    def test_load(self):
+        s = BeehiveSelector(10)
+        load_beehives(s, self.csv_path, top_n=10)
+        self.assertEqual(len(s.beehives), 10)
+        self.assertEqual(s.harvest_best_beehive(), max(self.value(r) for r in self.records))
+
+        s = BeehiveSelector(200)
+        load_beehives(s, self.jsonl_path)
+        self.assertEqual(len(s.beehives), 200)
+
+        s = BeehiveSelector(50)
+        s.set_all_beehives([Beehive(0, 0, 0, 5, 3, 4)])
+        with self.assertRaises(IndexError):
+            load_beehives(s, self.csv_path)
+        self.assertEqual(len(s.beehives), 1)
+        self.assertEqual(s.harvest_best_beehive(), 12)
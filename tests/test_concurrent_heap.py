@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from concurrent_heap import AsyncMaxHeap, ConcurrentMaxHeap
+
+
+class TestConcurrentMaxHeap(unittest.TestCase):
+
+    @timeout()
+    @number("6.1")
+    def test_threads(self):
+        heap = ConcurrentMaxHeap(8)
+        results = []
+
+        def produce(start):
+            for i in range(start, 1000, 4):
+                heap.add(i)
+
+        def consume():
+            for _ in range(500):
+                results.append(heap.get_max())
+
+        threads = [threading.Thread(target=produce, args=(i,)) for i in range(4)]
+        threads += [threading.Thread(target=consume) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(results), list(range(1000)))
+        self.assertEqual(len(heap), 0)
+
+    @timeout()
+    @number("6.2")
+    def test_bounds(self):
+        heap = ConcurrentMaxHeap(2)
+        heap.add(1)
+        heap.add(5)
+        with self.assertRaises(IndexError):
+            heap.add(3, block=False)
+        self.assertEqual(heap.get_max(), 5)
+        self.assertEqual(heap.get_max(), 1)
+        with self.assertRaises(IndexError):
+            heap.get_max(timeout=0.01)
+
+        unbounded = ConcurrentMaxHeap()
+        for i in range(100):
+            unbounded.add(i)
+        self.assertEqual([unbounded.get_max() for _ in range(100)], list(range(99, -1, -1)))
+
+    @timeout()
+    @number("6.3")
+    def test_async(self):
+        async def run():
+            heap = AsyncMaxHeap(4)
+            waiting = asyncio.ensure_future(heap.get_max())
+            await asyncio.sleep(0)
+            self.assertFalse(waiting.done())
+            await heap.add(7)
+            self.assertEqual(await waiting, 7)
+
+            async def produce():
+                for i in range(50):
+                    await heap.add(i)
+
+            async def consume():
+                return [await heap.get_max() for _ in range(50)]
+
+            _, got = await asyncio.gather(produce(), consume())
+            self.assertEqual(sorted(got), list(range(50)))
+            self.assertEqual(len(heap), 0)
+
+        asyncio.run(run())
@@ -0,0 +1,73 @@
+import os
+import random
+import tempfile
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from flat_tree import FlatThreeDeeBeeTree, flatten
+from threedeebeetree import ThreeDeeBeeTree
+
+
+class TestFlatTree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(48)
+        points = list({(random.randint(-100, 100), random.randint(-100, 100), random.randint(-100, 100))
+                       for _ in range(2000)})
+        self.pairs = [(point, {'id': i}) for i, point in enumerate(points)]
+        self.tree = ThreeDeeBeeTree.build_balanced(self.pairs)
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'tree.3dbt')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    @timeout()
+    @number("3.14")
+    def test_save_and_load(self):
+        self.tree.save(self.path)
+        for mmap in (True, False):
+            with ThreeDeeBeeTree.load(self.path, mmap=mmap) as flat:
+                self.assertEqual(len(flat), len(self.tree))
+                self.assertEqual(list(flat.iter_subtree()), list(self.tree.iter_subtree(self.tree.root)))
+                for point, item in self.pairs[::7]:
+                    self.assertIn(point, flat)
+                    self.assertEqual(flat[point], item)
+                self.assertNotIn((101, 0, 0), flat)
+                self.assertEqual(flat.get((101, 0, 0), 'missing'), 'missing')
+                with self.assertRaises(KeyError):
+                    flat[(101, 0, 0)]
+                for _ in range(50):
+                    lo = tuple(random.randint(-110, 100) for _ in range(3))
+                    hi = tuple(c + random.randint(-1, 80) for c in lo)
+                    expected = sorted(self.tree.range_query(lo, hi), key=lambda pair: pair[0])
+                    self.assertEqual(sorted(flat.range_query(lo, hi), key=lambda pair: pair[0]), expected)
+                    self.assertEqual(flat.count_in_box(lo, hi), self.tree.count_in_box(lo, hi))
+
+    @timeout()
+    @number("3.15")
+    def test_edge_cases(self):
+        empty = FlatThreeDeeBeeTree(flatten(ThreeDeeBeeTree()))
+        self.assertTrue(empty.is_empty())
+        self.assertNotIn((0, 0, 0), empty)
+        self.assertEqual(list(empty.range_query((0, 0, 0), (1, 1, 1))), [])
+        self.assertEqual(empty.count_in_box((0, 0, 0), (1, 1, 1)), 0)
+        with self.assertRaises(ValueError):
+            FlatThreeDeeBeeTree(bytes(64))
+
+        for point, _ in self.pairs[:500]:
+            del self.tree[point]
+        self.assertGreater(self.tree.tombstones, 0)
+        flat = FlatThreeDeeBeeTree(flatten(self.tree))
+        self.assertEqual(sorted(flat.iter_subtree()), sorted(self.tree.iter_subtree(self.tree.root)))
+        self.assertNotIn(self.pairs[0][0], flat)
+
+        for item in ('ab', 'abc', b'x' * 13):
+            one = ThreeDeeBeeTree()
+            one[(1, 2, 3)] = item
+            one.save(self.path)
+            self.assertNotEqual(os.path.getsize(self.path) % 8, 0)
+            for mmap in (True, False):
+                with ThreeDeeBeeTree.load(self.path, mmap=mmap) as flat:
+                    self.assertEqual(flat[(1, 2, 3)], item)
@@ -0,0 +1,83 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from grid_index import GridIndex
+from threedeebeetree import ThreeDeeBeeTree, distance_squared
+
+
+class TestGridIndex(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(47)
+        self.points = list({(random.randint(-60, 60), random.randint(-60, 60), random.randint(-60, 60))
+                            for _ in range(2000)})
+        self.pairs = [(point, i) for i, point in enumerate(self.points)]
+
+    @timeout()
+    @number("3.12")
+    def test_mapping(self):
+        grid = GridIndex.build(self.pairs, cell_size=7)
+        self.assertEqual(len(grid), len(self.pairs))
+        for point, i in self.pairs:
+            self.assertIn(point, grid)
+            self.assertEqual(grid[point], i)
+        self.assertNotIn((100, 100, 100), grid)
+        with self.assertRaises(KeyError):
+            grid[(100, 100, 100)]
+        with self.assertRaises(ValueError):
+            grid[self.points[0]] = 0
+        with self.assertRaises(ValueError):
+            GridIndex(0)
+
+        for point in self.points[:500]:
+            del grid[point]
+        self.assertEqual(len(grid), len(self.pairs) - 500)
+        self.assertEqual(grid.get_many(self.points[499:502], -1), [-1, 500, 501])
+        with self.assertRaises(KeyError):
+            del grid[self.points[0]]
+        self.assertEqual(sum(len(keys) for keys in grid.cells.values()), len(grid))
+
+    @timeout()
+    @number("3.13")
+    def test_queries(self):
+        tree = ThreeDeeBeeTree.build_balanced(self.pairs)
+        for cell_size in (1, 5, 64):
+            grid = GridIndex.build(self.pairs, cell_size)
+            for _ in range(30):
+                lo = tuple(random.randint(-70, 60) for _ in range(3))
+                hi = tuple(c + random.randint(-1, 40) for c in lo)
+                expected = sorted(tree.range_query(lo, hi))
+                self.assertEqual(sorted(grid.range_query(lo, hi)), expected)
+                self.assertEqual(grid.count_in_box(lo, hi), len(expected))
+
+                centre = tuple(random.randint(-80, 80) for _ in range(3))
+                self.assertEqual(sorted(grid.within_radius(centre, 12.5)), sorted(tree.within_radius(centre, 12.5)))
+                self.assertEqual(sorted(grid.neighbourhood(centre, 3)),
+                                 sorted(tree.range_query(tuple(c - 3 for c in centre), tuple(c + 3 for c in centre))))
+                found = grid.nearest(centre, 5)
+                expected = tree.nearest(centre, 5)
+                self.assertEqual([distance_squared(key, centre) for key, _ in found],
+                                 [distance_squared(key, centre) for key, _ in expected])
+        self.assertEqual(GridIndex().nearest((0, 0, 0)), [])
+
+        grid = GridIndex.build(self.pairs, cell_size=1)
+        for point in sorted(self.points)[:100] + sorted(self.points)[-100:]:
+            del grid[point]
+            del tree[point]
+        self.assertEqual(grid.cell_bounds(), GridIndex.build(grid, cell_size=1).cell_bounds())
+        for centre in ((10 ** 6, 0, 0), (-10 ** 6, 10 ** 6, 0), (0, 0, 0)):
+            self.assertEqual([distance_squared(key, centre) for key, _ in grid.nearest(centre, 3)],
+                             [distance_squared(key, centre) for key, _ in tree.nearest(centre, 3)])
+        self.assertEqual(sorted(grid.nearest((0, 0, 0), len(grid) + 5)), sorted(grid))
+
+        sparse = [(tuple(random.randint(-1000, 1000) for _ in range(3)), i) for i in range(300)]
+        sparse = list(dict(sparse).items())
+        grid = GridIndex.build(sparse, cell_size=1)
+        tree = ThreeDeeBeeTree.build_balanced(sparse)
+        for _ in range(20):
+            centre = tuple(random.randint(-1200, 1200) for _ in range(3))
+            for k in (1, 7, 400):
+                self.assertEqual([distance_squared(key, centre) for key, _ in grid.nearest(centre, k)],
+                                 [distance_squared(key, centre) for key, _ in tree.nearest(centre, k)])
@@ -0,0 +1,61 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from linear_octree import LinearOctree
+from threedeebeetree import ThreeDeeBeeTree
+
+
+class TestLinearOctree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(46)
+        self.points = list({(random.randint(-40, 40), random.randint(-40, 40), random.randint(-40, 40))
+                            for _ in range(3000)})
+        self.pairs = [(point, i) for i, point in enumerate(self.points)]
+
+    @timeout()
+    @number("3.10")
+    def test_mapping(self):
+        octree = LinearOctree.build(self.pairs[:2000])
+        for point, i in self.pairs[2000:]:
+            octree[point] = i
+        octree[(-100, 0, 100)] = "below the offset"
+        self.assertEqual(len(octree), len(self.pairs) + 1)
+        self.assertEqual(octree[(-100, 0, 100)], "below the offset")
+        for point, i in self.pairs:
+            self.assertIn(point, octree)
+            self.assertEqual(octree[point], i)
+        self.assertNotIn((41, 0, 0), octree)
+        self.assertNotIn((-200, 0, 0), octree)
+        with self.assertRaises(KeyError):
+            octree[(41, 0, 0)]
+        with self.assertRaises(ValueError):
+            octree[self.points[0]] = 0
+        with self.assertRaises(ValueError):
+            LinearOctree.build([((1, 2, 3), 0), ((1, 2, 3), 1)])
+
+        del octree[self.points[0]]
+        self.assertNotIn(self.points[0], octree)
+        self.assertEqual(octree.get(self.points[0], -1), -1)
+        self.assertEqual(octree.get_many(self.points[1:3]), [1, 2])
+        with self.assertRaises(KeyError):
+            del octree[self.points[0]]
+
+        empty = LinearOctree()
+        self.assertTrue(empty.is_empty())
+        self.assertNotIn((0, 0, 0), empty)
+        self.assertEqual(list(empty.range_query((0, 0, 0), (5, 5, 5))), [])
+
+    @timeout()
+    @number("3.11")
+    def test_range_query(self):
+        octree = LinearOctree.build(self.pairs)
+        tree = ThreeDeeBeeTree.build_balanced(self.pairs)
+        for _ in range(100):
+            lo = tuple(random.randint(-50, 40) for _ in range(3))
+            hi = tuple(c + random.randint(-2, 30) for c in lo)
+            expected = sorted(tree.range_query(lo, hi))
+            self.assertEqual(sorted(octree.range_query(lo, hi)), expected)
+            self.assertEqual(octree.count_in_box(lo, hi), len(expected))
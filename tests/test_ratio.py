@@ -1,9 +1,10 @@
 import random
+from math import ceil
 import unittest
 from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
-from ratio import Percentiles
+from ratio import Percentiles, WindowedPercentiles
 
 class RatioTest(unittest.TestCase):
 
@@ -39,4 +40,122 @@ class RatioTest(unittest.TestCase):
 
         p.remove_point(82)
         res = p.ratio(13, 10)
-        self.assertSetEqual(set(res), {14, 15, 16, 87, 91})
\ No newline at end of file
+        self.assertSetEqual(set(res), {14, 15, 16, 87, 91})
+
+    @timeout()
+    @number("2.3")
+    def test_multiset(self):
+        random.seed(1203981)
+        p = Percentiles(multiset=True)
+        points = [random.randint(0, 20) for _ in range(300)]
+        for point in points:
+            p.add_point(point)
+        for point in points[:100]:
+            p.remove_point(point)
+        remaining = sorted(points[100:])
+
+        self.assertEqual(len(p.bst), len(set(remaining)))
+        self.assertEqual(p.bst.root.subtree_size, len(remaining))
+        n = len(remaining)
+        for x, y in [(13, 10), (0, 42), (25, 25), (0, 0), (50, 49)]:
+            lower = ceil(n * x / 100)
+            upper = n - ceil(n * y / 100)
+            self.assertEqual(p.ratio(x, y), remaining[lower:upper])
+
+        with self.assertRaises(ValueError):
+            p.remove_point(21)
+
+    @timeout()
+    @number("2.4")
+    def test_quantiles(self):
+        random.seed(91283)
+        for multiset in (False, True):
+            p = Percentiles(multiset=multiset)
+            if multiset:
+                points = [random.randint(0, 50) for _ in range(400)]
+            else:
+                points = random.sample(range(1000), 400)
+            for point in points:
+                p.add_point(point)
+            ordered = sorted(points)
+            n = len(ordered)
+
+            qs = [50, 99, 0, 100, 25, 12.5, 75]
+            expected = [ordered[max(1, ceil(n * q / 100)) - 1] for q in qs]
+            self.assertEqual(p.quantiles(qs), expected)
+            self.assertEqual(p.quantile(50), expected[0])
+
+            for low, high in [(10, 40), (0, 1000), (30, 30), (40, 10)]:
+                self.assertEqual(p.count_between(low, high), sum(1 for v in ordered if low <= v <= high))
+
+            for x, y in [(13, 10), (0, 42), (25, 25), (0, 0), (50, 49)]:
+                self.assertEqual(list(p.iter_ratio(x, y)), list(p.ratio(x, y)))
+
+    @timeout()
+    @number("2.6")
+    def test_window(self):
+        random.seed(4019)
+        p = WindowedPercentiles(max_points=50)
+        points = [random.randint(0, 30) for _ in range(500)]
+        for i, point in enumerate(points):
+            p.add_point(point)
+            if i % 37 == 0:
+                window = sorted(points[max(0, i - 49):i + 1])
+                self.assertEqual(p.bst.root.subtree_size, len(window))
+                self.assertEqual(p.ratio(10, 10), Percentiles.ratio(self.exact(window), 10, 10))
+
+        now = [0.0]
+        p = WindowedPercentiles(max_age=10, clock=lambda: now[0])
+        arrivals = []
+        for i, point in enumerate(points):
+            now[0] = i * 0.5 + (20 if i > 300 else 0)
+            arrivals.append((now[0], point))
+            p.add_point(point)
+        now[0] += 4
+        window = sorted(v for t, v in arrivals if t > now[0] - 10)
+        self.assertEqual(len(p), len(window))
+        self.assertEqual(p.quantiles([50, 90]), self.exact(window).quantiles([50, 90]))
+        now[0] += 100
+        self.assertEqual(len(p), 0)
+        self.assertEqual(p.ratio(10, 10), [])
+
+        p = WindowedPercentiles(max_points=20)
+        window = []
+        for i, point in enumerate(points[:200]):
+            p.add_point(point)
+            window = (window + [point])[-20:]
+            if i % 7 == 3:
+                p.remove_point(window[len(window) // 2])
+                window.remove(window[len(window) // 2])
+            self.assertEqual(len(p), len(window))
+            self.assertEqual(p.quantiles([10, 50, 90]), self.exact(window).quantiles([10, 50, 90]))
+        with self.assertRaises(ValueError):
+            p.remove_point(31)
+
+    @staticmethod
+    def exact(points):
+        p = Percentiles(multiset=True)
+        for point in points:
+            p.add_point(point)
+        return p
+
+    @timeout()
+    @number("2.7")
+    def test_cache(self):
+        p = Percentiles(cache_size=2)
+        for point in [4, 9, 14, 15, 16, 82, 87, 91, 92, 99]:
+            p.add_point(point)
+        first = p.ratio(13, 10)
+        self.assertIs(p.ratio(13, 10), first)
+        self.assertEqual((p.cache_hits, p.cache_misses), (1, 1))
+
+        p.ratio(0, 42)
+        p.ratio(13, 10)
+        p.ratio(25, 25)  # evicts (0, 42), the least recently used
+        self.assertEqual((p.cache_hits, p.cache_misses), (2, 3))
+        p.ratio(0, 42)
+        self.assertEqual(p.cache_misses, 4)
+
+        p.remove_point(4)
+        self.assertEqual(set(p.ratio(13, 10)), {15, 16, 82, 87, 91, 92})
+        self.assertEqual(p.cache_misses, 5)
@@ -0,0 +1,47 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from beehive import Beehive
+from regeneration import RegeneratingBeehiveSelector
+
+
+class TestRegeneratingBeehiveSelector(unittest.TestCase):
+
+    @timeout()
+    @number("5.5")
+    def test_matches_eager_regeneration(self):
+        random.seed(5512093)
+        n = 60
+        capacities = [random.uniform(5, 50) for _ in range(n)]
+        factors = [random.uniform(1, 10) for _ in range(n)]
+        volumes = [random.uniform(0, 60) for _ in range(n)]
+        rates = [random.choice([0, random.uniform(0, 3)]) for _ in range(n)]
+        updated = [0.0] * n
+
+        s = RegeneratingBeehiveSelector(n)
+        s.set_all_beehives(
+            [Beehive(i, i, i, capacities[i], factors[i], volumes[i]) for i in range(n)],
+            rates, now=0.0,
+        )
+
+        now = 0.0
+        for _ in range(500):
+            now += random.choice([0, random.uniform(0, 2)])
+            current = [volumes[i] + rates[i] * (now - updated[i]) for i in range(n)]
+            values = [factors[i] * min(capacities[i], current[i]) for i in range(n)]
+            best = max(range(n), key=values.__getitem__)
+            volumes[best] = current[best] - min(current[best], capacities[best])
+            updated[best] = now
+            self.assertAlmostEqual(s.harvest_best_beehive(now), values[best], 6)
+
+    @timeout()
+    @number("5.6")
+    def test_empty(self):
+        s = RegeneratingBeehiveSelector(3)
+        with self.assertRaises(IndexError):
+            s.harvest_best_beehive(0)
+        s.add_beehive(Beehive(0, 0, 0, capacity=10, nutrient_factor=2, volume=0), rate=1, now=0)
+        self.assertEqual(s.harvest_best_beehive(4), 8)
+        self.assertEqual(s.harvest_best_beehive(20), 20)
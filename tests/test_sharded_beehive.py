@@ -0,0 +1,44 @@
+import random
+import unittest
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from beehive import BeehiveSelector, Beehive
+from sharded_beehive import ShardedBeehiveSelector
+
+
+class TestShardedBeehiveSelector(unittest.TestCase):
+
+    @staticmethod
+    def make_hives(seed, n):
+        random.seed(seed)
+        return [
+            Beehive(i, 2 * i, 3 * i, capacity=random.randint(1, 30),
+                    nutrient_factor=random.randint(1, 10), volume=random.randint(0, 200))
+            for i in range(n)
+        ]
+
+    @timeout(10)
+    @number("5.3")
+    def test_matches_single_selector(self):
+        single = BeehiveSelector(200)
+        single.set_all_beehives(self.make_hives(91823, 200))
+        expected = [single.harvest_best_beehive() for _ in range(300)]
+
+        with ShardedBeehiveSelector(100, n_shards=3) as sharded:
+            sharded.set_all_beehives(self.make_hives(91823, 200))
+            self.assertEqual(len(sharded), 200)
+            actual = [sharded.harvest_best_beehive() for _ in range(100)]
+            actual += sharded.harvest_many(200)
+        self.assertEqual(actual, expected)
+
+    @timeout(10)
+    @number("5.4")
+    def test_add_beehive(self):
+        hives = self.make_hives(1203, 40)
+        single = BeehiveSelector(40)
+        with ShardedBeehiveSelector(20, n_shards=2) as sharded:
+            for hive in hives:
+                single.add_beehive(Beehive(hive.x, hive.y, hive.z, hive.capacity, hive.nutrient_factor, hive.volume))
+                sharded.add_beehive(hive)
+            self.assertEqual(sharded.harvest_many(60), [single.harvest_best_beehive() for _ in range(60)])
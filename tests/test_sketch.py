@@ -0,0 +1,41 @@
+import random
+import unittest
+from math import ceil
+from ed_utils.decorators import number, visibility
+from ed_utils.timeout import timeout
+
+from ratio import SketchPercentiles
+
+
+class TestSketchPercentiles(unittest.TestCase):
+
+    @timeout()
+    @number("2.5")
+    def test_accuracy_and_merge(self):
+        random.seed(1029)
+        n = 20000
+        data = random.sample(range(10 * n), n)
+        ordered = sorted(data)
+
+        whole = SketchPercentiles(k=200, seed=1)
+        parts = [SketchPercentiles(k=200, seed=i + 2) for i in range(4)]
+        for i, point in enumerate(data):
+            whole.add_point(point)
+            parts[i % 4].add_point(point)
+        merged = parts[0]
+        for part in parts[1:]:
+            merged.merge(part)
+
+        qs = [1, 10, 25, 50, 75, 90, 99]
+        for p in (whole, merged):
+            self.assertEqual(len(p), n)
+            self.assertLess(p.sketch.size, 1000)
+            for q, estimate in zip(qs, p.quantiles(qs)):
+                true_rank = ceil(n * q / 100)
+                self.assertLess(abs(ordered.index(estimate) + 1 - true_rank) / n, 0.03)
+
+            self.assertLess(abs(p.count_between(ordered[5000], ordered[14999]) - 10000) / n, 0.03)
+            sample = p.ratio(20, 30)
+            self.assertTrue(all(ordered[int(0.17 * n)] <= v <= ordered[int(0.73 * n)] for v in sample))
+
+        self.assertFalse(hasattr(whole, 'remove_point'))
@@ -1,8 +1,25 @@
+import random
 import unittest
 from ed_utils.decorators import number, visibility
 from ed_utils.timeout import timeout
 
-from threedeebeetree import ThreeDeeBeeTree
+from aggregates import Aggregate
+from beehive import Beehive
+from threedeebeetree import ThreeDeeBeeTree, DELETED, NO_CHILDREN
+
+
+def find_unbalanced(tdbt):
+    """ Keys of the nodes of tdbt which is_unbalanced, in pre-order. """
+    found = []
+    stack = [tdbt.root]
+    while stack:
+        node = stack.pop()
+        if node is not None:
+            if tdbt.is_unbalanced(node):
+                found.append(node.key)
+            stack.extend(node.child)
+    return found
+
 
 class TestThreeDeeBeeTree(unittest.TestCase):
 
@@ -64,3 +81,258 @@ class TestThreeDeeBeeTree(unittest.TestCase):
         
         self.assertEqual(tdbt.get_tree_node_by_key((16, 0, -14)).item, 7)
         self.assertEqual(tdbt.get_tree_node_by_key((6, -1, -17)).item, 0)
+
+    @timeout()
+    @number("3.4")
+    def test_build_balanced(self):
+        random.seed(10239123)
+        coords = list(range(10000))
+        random.shuffle(coords)
+        points = [(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]) for i in range(3000)]
+        tdbt = ThreeDeeBeeTree.build_balanced((p, i) for i, p in enumerate(points))
+
+        self.assertEqual(len(tdbt), len(points))
+        for i, p in enumerate(points):
+            self.assertEqual(tdbt[p], i)
+
+        def check_sizes(node):
+            if node is None:
+                return 0
+            size = (node.item is not DELETED) + sum(check_sizes(child) for child in node.child)
+            self.assertEqual(node.subtree_size, size)
+            return size
+        check_sizes(tdbt.root)
+        self.assertEqual(find_unbalanced(tdbt), [])
+        self.assertLessEqual(tdbt.tombstones, len(tdbt))
+
+        small = ThreeDeeBeeTree.build_balanced((p, i) for i, p in enumerate(self.TESTING_POINTS))
+        self.assertEqual([small[p] for p in self.TESTING_POINTS], list(range(10)))
+        with self.assertRaises(ValueError):
+            ThreeDeeBeeTree.build_balanced([((1, 2, 3), 0), ((1, 2, 3), 1)])
+
+    @timeout()
+    @number("3.5")
+    def test_range_query(self):
+        random.seed(3311)
+        points = list({(random.randint(-50, 50), random.randint(-50, 50), random.randint(-50, 50)) for _ in range(2000)})
+        tdbt = ThreeDeeBeeTree()
+        for i, p in enumerate(points):
+            tdbt[p] = i
+
+        boxes = [((-10, -20, -5), (30, 10, 40)), ((-100, -100, -100), (100, 100, 100)),
+                 ((0, 0, 0), (0, 0, 0)), ((5, 5, 5), (4, 10, 10)), (points[0], points[0])]
+        for lo, hi in boxes:
+            expected = {(p, i) for i, p in enumerate(points) if all(lo[a] <= p[a] <= hi[a] for a in range(3))}
+            found = list(tdbt.range_query(lo, hi))
+            self.assertEqual(len(found), len(expected))
+            self.assertEqual(set(found), expected)
+            self.assertEqual(tdbt.count_in_box(lo, hi), len(expected))
+
+        self.assertEqual(list(ThreeDeeBeeTree().range_query((0, 0, 0), (1, 1, 1))), [])
+
+    @timeout()
+    @number("3.6")
+    def test_nearest(self):
+        random.seed(9120)
+        points = list({(random.randint(-100, 100), random.randint(-100, 100), random.randint(-100, 100)) for _ in range(1500)})
+        tdbt = ThreeDeeBeeTree()
+        for i, p in enumerate(points):
+            tdbt[p] = i
+
+        def dist(a, b):
+            return sum((a[i] - b[i]) ** 2 for i in range(3))
+
+        for target in [(0, 0, 0), (100, -100, 50), (500, 500, 500), points[3]]:
+            ordered = sorted(dist(p, target) for p in points)
+            found = tdbt.nearest(target, 10)
+            self.assertEqual([dist(p, target) for p, _ in found], ordered[:10])
+            self.assertTrue(all(tdbt[p] == i for p, i in found))
+
+            within = list(tdbt.within_radius(target, 40))
+            self.assertEqual(sorted(p for p, _ in within), sorted(p for p in points if dist(p, target) <= 1600))
+
+        self.assertEqual(tdbt.nearest(points[3], 1)[0][0], points[3])
+        self.assertEqual(len(tdbt.nearest((0, 0, 0), 5000)), len(points))
+        self.assertEqual(ThreeDeeBeeTree().nearest((0, 0, 0), 3), [])
+
+    @timeout(10)
+    @number("3.7")
+    def test_delete_and_rebalance(self):
+        random.seed(48812)
+        tdbt = ThreeDeeBeeTree(rebalance=True)
+        present = {}
+        for step in range(4000):
+            if present and random.random() < 0.4:
+                key = random.choice(list(present))
+                del tdbt[key]
+                del present[key]
+            else:
+                # Drifting keys skew a plain 3DBT badly.
+                key = (step + random.randint(0, 5), step // 2 + random.randint(0, 5), random.randint(0, 3000))
+                if key not in present:
+                    tdbt[key] = step
+                    present[key] = step
+
+        self.assertEqual(len(tdbt), len(present))
+        self.assertEqual(dict(tdbt.iter_subtree(tdbt.root)), present)
+
+        def check_sizes(node):
+            if node is None:
+                return 0
+            size = (node.item is not DELETED) + sum(check_sizes(child) for child in node.child)
+            self.assertEqual(node.subtree_size, size)
+            return size
+        check_sizes(tdbt.root)
+        self.assertEqual(find_unbalanced(tdbt), [])
+        self.assertLessEqual(tdbt.tombstones, len(tdbt))
+
+        plain = ThreeDeeBeeTree()
+        for i, point in enumerate(self.TESTING_POINTS):
+            plain[point] = i
+        del plain[(-11, 4, -16)]
+        del plain[(6, -1, -17)]
+        self.assertEqual(len(plain), 8)
+        self.assertEqual(plain.root.subtree_size, 8)
+        for i, point in enumerate(self.TESTING_POINTS[2:]):
+            self.assertEqual(plain[point], i + 2)
+        with self.assertRaises(KeyError):
+            del plain[(6, -1, -17)]
+        self.assertNotIn((6, -1, -17), plain)
+        self.assertEqual(plain.tombstones, 2)
+        self.assertEqual(plain.count_in_box((-20, -20, -20), (20, 20, 20)), 8)
+        self.assertNotIn((6, -1, -17), dict(plain.nearest((6, -1, -17), 3)))
+
+        plain[(6, -1, -17)] = "back"  # revives the tombstone
+        self.assertEqual((plain[(6, -1, -17)], len(plain), plain.tombstones), ("back", 9, 1))
+        self.assertEqual(plain.root.subtree_size, 9)
+        for point in self.TESTING_POINTS[2:7]:
+            del plain[point]
+        # 6 tombstones would outnumber the 4 keys, so the tree was rebuilt.
+        self.assertEqual(plain.tombstones, 0)
+        self.assertEqual(len(plain), 4)
+        self.assertEqual(sorted(plain.iter_subtree(plain.root)),
+                         sorted([((6, -1, -17), "back")] + [(p, i + 7) for i, p in enumerate(self.TESTING_POINTS[7:])]))
+
+    @timeout()
+    @number("3.8")
+    def test_lookups(self):
+        tdbt = ThreeDeeBeeTree()
+        self.assertNotIn((0, 0, 0), tdbt)
+        with self.assertRaises(KeyError):
+            tdbt[(0, 0, 0)]
+        for i, point in enumerate(self.TESTING_POINTS):
+            tdbt[point] = i
+
+        self.assertNotIn((0, 0, 0), tdbt)
+        self.assertIn((5, 5, 7), tdbt)
+        with self.assertRaises(KeyError):
+            tdbt[(-6, 3, -20)]
+        self.assertEqual(tdbt.get((4, 6, 19)), 9)
+        self.assertEqual(tdbt.get((4, 6, 18), "missing"), "missing")
+
+        queries = self.TESTING_POINTS[::-1] + [(0, 0, 0), (100, -100, 3)]
+        self.assertEqual(tdbt.get_many(queries, -1), list(range(9, -1, -1)) + [-1, -1])
+        self.assertEqual(tdbt.get_many([]), [])
+
+    @timeout()
+    @number("3.9")
+    def test_compact_nodes(self):
+        random.seed(45)
+        points = list({(random.randint(-200, 200), random.randint(-200, 200), random.randint(-200, 200))
+                       for _ in range(1500)})
+        pairs = [(point, i) for i, point in enumerate(points)]
+        plain = ThreeDeeBeeTree.build_balanced(pairs)
+        compact = ThreeDeeBeeTree.build_balanced(pairs, compact=True)
+        self.assertEqual(list(compact.iter_subtree(compact.root)), list(plain.iter_subtree(plain.root)))
+
+        inserted = ThreeDeeBeeTree(rebalance=True, compact=True)
+        for point, i in pairs:
+            inserted[point] = i
+        for point, _ in pairs[::3]:
+            del inserted[point]
+        expected = dict(pairs[i] for i in range(len(pairs)) if i % 3)
+        self.assertEqual(dict(inserted.iter_subtree(inserted.root)), expected)
+        for point, i in expected.items():
+            self.assertEqual(inserted[point], i)
+        self.assertEqual(sorted(inserted.range_query((-50, -50, -50), (50, 50, 50))),
+                         sorted((p, i) for p, i in expected.items() if all(-50 <= c <= 50 for c in p)))
+
+        stack = [inserted.root]
+        while stack:
+            node = stack.pop()
+            self.assertFalse(hasattr(node, '__dict__'))
+            if inserted.is_leaf(node):
+                self.assertIs(node.child, NO_CHILDREN)
+            stack.extend(child for child in node.child if child is not None)
+
+    @timeout()
+    @number("3.16")
+    def test_aggregates(self):
+        aggregates = {'total': Aggregate.sum('capacity'), 'least': Aggregate.min('capacity'),
+                      'most': Aggregate.max(lambda hive: hive.nutrient_factor * hive.capacity)}
+
+        def expected(hives, lo, hi):
+            inside = [hive for key, hive in hives.items() if all(lo[i] <= key[i] <= hi[i] for i in range(3))]
+            return {'total': sum(hive.capacity for hive in inside),
+                    'least': min((hive.capacity for hive in inside), default=float('inf')),
+                    'most': max((hive.nutrient_factor * hive.capacity for hive in inside), default=float('-inf'))}
+
+        for compact in (False, True):
+            random.seed(49)
+            hives = {}
+            for _ in range(1500):
+                hive = Beehive(random.randint(-50, 50), random.randint(-50, 50), random.randint(-50, 50),
+                               random.randint(1, 100), random.randint(1, 9))
+                hives[(hive.x, hive.y, hive.z)] = hive
+            points = list(hives)
+
+            tdbt = ThreeDeeBeeTree.build_balanced(((key, hives[key]) for key in points[:700]),
+                                                  rebalance=True, compact=compact, aggregates=aggregates)
+            for key in points[700:]:
+                tdbt[key] = hives[key]
+            for key in points[:300]:
+                del tdbt[key]
+                del hives[key]
+            hives[points[400]].capacity = 1000
+            tdbt.refresh_aggregates(points[400])
+
+            everything = ((-50, -50, -50), (50, 50, 50))
+            self.assertEqual(tdbt.aggregate_in_box(*everything), expected(hives, *everything))
+            for _ in range(40):
+                lo = tuple(random.randint(-60, 50) for _ in range(3))
+                hi = tuple(c + random.randint(-1, 50) for c in lo)
+                self.assertEqual(tdbt.aggregate_in_box(lo, hi), expected(hives, lo, hi))
+
+        with self.assertRaises(KeyError):
+            tdbt.refresh_aggregates((100, 100, 100))
+        self.assertEqual(ThreeDeeBeeTree().aggregate_in_box((0, 0, 0), (1, 1, 1)), {})
+
+    @timeout()
+    @number("3.18")
+    def test_rebalance_shared_coordinates(self):
+        random.seed(4318)
+        planar = ThreeDeeBeeTree(rebalance=True)
+        points = list({(random.randint(0, 10 ** 6), random.randint(0, 10 ** 6), 0) for _ in range(3000)})
+        for i, point in enumerate(points):
+            planar[point] = i
+        self.assertEqual(find_unbalanced(planar), [])
+        self.assertEqual(planar.unimprovable, {})
+
+        # No coplanar node can keep every child within a fifth of it, so
+        # every rebuild fails; each node is then only rebuilt again once its
+        # subtree has doubled.
+        class Strict(ThreeDeeBeeTree):
+            BALANCE_ALPHA = 1 / 5
+
+        rebuilds = []
+        strict = Strict(rebalance=True)
+        build_subtree = strict.build_subtree
+        strict.build_subtree = lambda pairs: rebuilds.append(len(pairs)) or build_subtree(pairs)
+        for i, point in enumerate(points):
+            strict[point] = i
+        self.assertNotEqual(strict.unimprovable, {})
+        self.assertLess(sum(rebuilds), 20 * len(points))
+        for key in points[::2]:
+            del strict[key]
+        self.assertEqual(dict(strict.iter_subtree(strict.root)),
+                         {key: i for i, key in enumerate(points) if i % 2})
@@ -1,10 +1,73 @@
 from __future__ import annotations
-from typing import Generic, TypeVar, Tuple
+from typing import Generic, Iterable, Iterator, TypeVar, Tuple
+from math import inf
+from heap import MaxHeap
+from morton import min_corner, morton_encode
+from aggregates import Aggregate
+from balancing import select_root, sort_by_axis, split_octants
 from dataclasses import dataclass, field
 
 I = TypeVar('I')
 Point = Tuple[int, int, int]
 
+# A region of space covered by a subtree: for each axis, an inclusive lower
+# bound and an exclusive upper bound.
+Region = Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+UNBOUNDED: Region = ((-inf, -inf, -inf), (inf, inf, inf))
+
+
+def octant_region(region: Region, key: Point, octant: int) -> Region:
+    """
+    The part of region covered by the given octant of a node with this key.
+    Octant bit i set means coordinate i >= key[i], otherwise < key[i].
+
+    Time Complexity:
+    - Best case = Worst case: O(1)
+    """
+    lo, hi = list(region[0]), list(region[1])
+    for axis in range(3):
+        if octant & (1 << axis):
+            lo[axis] = max(lo[axis], key[axis])
+        else:
+            hi[axis] = min(hi[axis], key[axis])
+    return tuple(lo), tuple(hi)
+
+
+def region_overlaps(region: Region, lo: Point, hi: Point) -> bool:
+    """ Whether region may contain a point p with lo <= p <= hi. """
+    return all(region[0][i] <= hi[i] and region[1][i] > lo[i] for i in range(3))
+
+
+def region_inside(region: Region, lo: Point, hi: Point) -> bool:
+    """ Whether every point of region satisfies lo <= p <= hi. """
+    return all(region[0][i] >= lo[i] and region[1][i] <= hi[i] for i in range(3))
+
+
+def region_distance_squared(region: Region, point: Point) -> float:
+    """
+    Squared euclidean distance from point to the nearest point of region,
+    a lower bound on the distance to any key stored under it.
+
+    Time Complexity:
+    - Best case = Worst case: O(1)
+    """
+    distance = 0
+    for i in range(3):
+        if point[i] < region[0][i]:
+            distance += (region[0][i] - point[i]) ** 2
+        elif point[i] > region[1][i]:
+            distance += (point[i] - region[1][i]) ** 2
+    return distance
+
+
+def distance_squared(a: Point, b: Point) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+# Item of a deleted node. The node stays in place, keeping its key to route
+# searches, until the subtree holding it is rebuilt.
+DELETED = object()
+
 
 @dataclass
 class BeeNode:
@@ -12,6 +75,7 @@ class BeeNode:
     item: I
     subtree_size: int = 1
     child: list[BeeNode | None] = field(default_factory=lambda: [None] * 8)
+    aggregate: tuple = ()
 
     def get_child_for_key(self, point: Point) -> BeeNode | None:
         """
@@ -28,16 +92,303 @@ class BeeNode:
 
         return self.child[octant]
 
+    def set_child(self, octant: int, node: BeeNode | None) -> None:
+        self.child[octant] = node
+
+
+# Shared by every CompactBeeNode without children.
+NO_CHILDREN = (None,) * 8
+
+
+@dataclass(slots=True)
+class CompactBeeNode:
+    """
+    BeeNode without an instance dict, whose leaves all share NO_CHILDREN
+    instead of holding their own list of 8 empty slots. A child list is only
+    allocated when the first child is set, and dropped when the last one is
+    cleared. Children are read through child exactly as for BeeNode, but
+    must be written with set_child.
+    """
+
+    key: Point
+    item: I
+    subtree_size: int = 1
+    child: list[CompactBeeNode | None] | tuple[None, ...] = NO_CHILDREN
+    aggregate: tuple = ()
+
+    get_child_for_key = BeeNode.get_child_for_key
+
+    def set_child(self, octant: int, node: CompactBeeNode | None) -> None:
+        """
+        Time Complexity:
+        - Worst case: O(1), allocating or scanning the 8 slots at most once
+        - Best case: O(1)
+        """
+        if self.child is NO_CHILDREN:
+            if node is None:
+                return
+            self.child = [None] * 8
+        self.child[octant] = node
+        if node is None and not any(self.child):
+            self.child = NO_CHILDREN
+
 
 class ThreeDeeBeeTree(Generic[I]):
     """ 3️⃣🇩🐝🌳 tree. """
 
-    def __init__(self) -> None:
+    BASE_CASE_SIZE = 17
+    # A node is unbalanced once one child holds more than BALANCE_ALPHA of
+    # its subtree. build_subtree keeps every child within 6/7 whenever some
+    # axis can be split, so a rebuilt node only becomes unbalanced again
+    # after a number of updates proportional to its size.
+    BALANCE_ALPHA = 7 / 8
+    MIN_REBUILD_SIZE = 19
+
+    def __init__(self, rebalance: bool = False, compact: bool = False,
+                 aggregates: dict[str, Aggregate] | None = None) -> None:
         """
-            Initialises an empty 3DBT
+            Initialises an empty 3DBT. With rebalance, inserts and deletes
+            rebuild the highest subtree whose octants become too skewed.
+            With compact, nodes are CompactBeeNodes rather than BeeNodes.
+            Every node keeps the value of each of aggregates over its
+            subtree, in node.aggregate, in the order of aggregates.
         """
         self.root = None
         self.length = 0
+        self.rebalance = rebalance
+        self.node_type = CompactBeeNode if compact else BeeNode
+        self.aggregates = dict(aggregates or {})
+        # id of each node whose rebuild left it unbalanced, with its size then
+        self.unimprovable = {}
+        self.tombstones = 0
+
+    @classmethod
+    def build_balanced(cls, points_with_items: Iterable[tuple[Point, I]], rebalance: bool = False,
+                       compact: bool = False, aggregates: dict[str, Aggregate] | None = None) -> ThreeDeeBeeTree[I]:
+        """
+        Builds a balanced tree directly from (point, item) pairs, creating each
+        BeeNode with its children and subtree_size in place rather than
+        inserting the points one by one from the root.
+
+        Time Complexity:
+        - Worst case: O(N*log(N) + N*D), where N is the number of points and D the depth of the tree
+        - Best case: O(1), when there are no points
+        """
+        tree = cls(rebalance, compact, aggregates)
+        pairs = list(points_with_items)
+        tree.root = tree.build_subtree(pairs)
+        tree.length = len(pairs)
+        return tree
+
+    def build_subtree(self, pairs: list[tuple[Point, I]]) -> BeeNode | None:
+        """
+        Builds a balanced subtree holding the (point, item) pairs and returns its root.
+
+        Each subtree's root and octants are chosen by balancing.select_root
+        and balancing.split_octants, as in balancing.iter_ordering, except that
+        keys equal to the root on an axis go to its upper half. If no point
+        has a rank within bounds on every axis, the first point is the root.
+
+        Time Complexity:
+        - Worst case: O(N*log(N) + N*D), where N is the number of points and D the depth of the tree
+        - Best case: O(1), when there are no points
+        """
+        n = len(pairs)
+        if n == 0:
+            return None
+        keys = [pair[0] for pair in pairs]
+        by_axis = sort_by_axis(keys, range(n))
+        for a, b in zip(by_axis[0], by_axis[0][1:]):  # equal keys sort next to each other
+            if keys[a] == keys[b]:
+                raise ValueError('Inserting duplicate item')
+
+        ranks = [[0] * n for _ in range(3)]
+        octant_of = [0] * n
+        holder = BeeNode(keys[0], None)  # stands in as the parent of the root
+        # Each entry: indices in input order, the same indices sorted along
+        # each axis, and the node and octant the subtree hangs from.
+        stack = [(list(range(n)), by_axis, holder, 0)]
+        while stack:
+            order, sorted_lists, parent, parent_octant = stack.pop()
+            size = len(order)
+            if size <= self.BASE_CASE_SIZE:
+                # Small enough to insert in input order, as make_ordering does.
+                subtree = None
+                for i in order:
+                    subtree = self.attach_leaf(subtree, keys[i], pairs[i][1])
+                parent.set_child(parent_octant, subtree)
+                continue
+
+            root_index = select_root(order, sorted_lists, ranks)
+            if root_index is None:
+                root_index = order[0]
+            key = keys[root_index]
+            node = self.node_type(key, item=pairs[root_index][1], subtree_size=size)
+            parent.set_child(parent_octant, node)
+
+            octant_orders, octant_sorted = split_octants(
+                keys, order, sorted_lists, root_index, key, lambda point, root: self.octant_for(root, point), octant_of)
+            for octant in range(8):
+                if octant_orders[octant]:
+                    stack.append((octant_orders[octant], octant_sorted[octant], node, octant))
+
+        if self.aggregates:
+            self.refresh_subtree(holder.child[0])
+        return holder.child[0]
+
+    def attach_leaf(self, subtree: BeeNode | None, key: Point, item: I) -> BeeNode:
+        """
+        Inserts key below subtree without touching the length of the tree,
+        returning the root of the subtree.
+
+        Time Complexity:
+        - Worst case: O(d), where d is the depth of the subtree
+        - Best case: O(1), when the subtree is empty
+        """
+        leaf = self.node_type(key, item=item)
+        if self.aggregates:
+            leaf.aggregate = self.lift(item)
+        if subtree is None:
+            return leaf
+        current = subtree
+        while True:
+            current.subtree_size += 1
+            if self.aggregates:
+                current.aggregate = self.combine(current.aggregate, leaf.aggregate)
+            octant = self.octant_for(current.key, key)
+            if current.child[octant] is None:
+                current.set_child(octant, leaf)
+                return subtree
+            current = current.child[octant]
+
+    @staticmethod
+    def octant_for(root: Point, key: Point) -> int:
+        """
+        Index of the child of a node keyed root that key belongs under.
+
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        octant = 0
+        if key[0] >= root[0]:
+            octant += 1
+        if key[1] >= root[1]:
+            octant += 2
+        if key[2] >= root[2]:
+            octant += 4
+        return octant
+
+    def __delitem__(self, key: Point) -> None:
+        """
+        Removes key by leaving its node in place as a tombstone, which lookups
+        and queries skip and subtree_size does not count. Once tombstones
+        outnumber the keys, the whole tree is rebuilt without them.
+
+        Time Complexity:
+        - Worst case: O(D + N*log(N)), where D is the depth of the tree and N the number of keys, when the tree is rebuilt
+        - Best case: O(D), amortised O(D + log(N)) over the deletes since the last rebuild
+        """
+        path = self.path_to(key)
+        if not path or path[-1].key != key or path[-1].item is DELETED:
+            raise KeyError('Key not found: {0}'.format(key))
+        path[-1].item = DELETED
+        for node in path:
+            node.subtree_size -= 1
+        if self.aggregates:
+            for node in reversed(path):
+                self.refresh_node(node)
+        self.length -= 1
+        self.tombstones += 1
+        if self.tombstones > self.length:
+            self.root = self.build_subtree(self.take_subtree(self.root))
+        elif self.rebalance:
+            self.rebuild_scapegoat(path)
+
+    def path_to(self, key: Point) -> list[BeeNode]:
+        """
+        Nodes from the root down to the node with key, or down to the last
+        node visited if key is not in the tree.
+
+        Time Complexity:
+        - Worst case: O(D), where D is the depth of the tree
+        - Best case: O(1), when key is at the root
+        """
+        path = []
+        current = self.root
+        while current is not None:
+            path.append(current)
+            if current.key == key:
+                break
+            current = current.child[self.octant_for(current.key, key)]
+        return path
+
+    def replace_subtree(self, path: list[BeeNode], subtree: BeeNode | None) -> None:
+        """ Puts subtree where the last node of path hangs. """
+        if len(path) == 1:
+            self.root = subtree
+        else:
+            parent = path[-2]
+            parent.set_child(self.octant_for(parent.key, path[-1].key), subtree)
+
+    def is_unbalanced(self, node: BeeNode) -> bool:
+        """
+        Whether one of node's children holds more than BALANCE_ALPHA of its
+        subtree. Small subtrees are never unbalanced.
+
+        Time Complexity:
+        - Best case = Worst case: O(1)
+        """
+        if node.subtree_size < self.MIN_REBUILD_SIZE:
+            return False
+        limit = self.BALANCE_ALPHA * node.subtree_size
+        for child in node.child:
+            if child is not None and child.subtree_size > limit:
+                return True
+        return False
+
+    def rebuild_scapegoat(self, path: list[BeeNode]) -> None:
+        """
+        Rebuilds the highest unbalanced node of path, if any.
+
+        Points sharing coordinates may leave no way to split a subtree, so a
+        rebuild that does not balance the node is remembered, and that node is
+        not rebuilt again until its subtree has doubled in size.
+
+        Time Complexity:
+        - Worst case: O(D + K*log(K)), where D is the length of path and K the size of the rebuilt subtree
+        - Best case: O(D), when every node is balanced
+        """
+        for depth, node in enumerate(path):
+            if not self.is_unbalanced(node):
+                continue
+            if node.subtree_size < 2 * self.unimprovable.get(id(node), 0):
+                continue
+            subtree = self.build_subtree(self.take_subtree(node))
+            self.replace_subtree(path[:depth + 1], subtree)
+            if self.is_unbalanced(subtree):
+                self.unimprovable[id(subtree)] = subtree.subtree_size
+            return
+
+    def take_subtree(self, current: BeeNode | None) -> list[tuple[Point, I]]:
+        """
+        The (key, item) pairs of a subtree that is about to be replaced,
+        forgetting its tombstones and what the tree remembers about its nodes.
+
+        Time Complexity:
+        - Best case = Worst case: O(K), where K is the size of the subtree
+        """
+        pairs = []
+        stack = [current]
+        while stack:
+            node = stack.pop()
+            if node is not None:
+                if node.item is DELETED:
+                    self.tombstones -= 1
+                else:
+                    pairs.append((node.key, node.item))
+                self.unimprovable.pop(id(node), None)
+                stack.extend(reversed(node.child))
+        return pairs
 
     def is_empty(self) -> bool:
         """
@@ -67,8 +418,64 @@ class ThreeDeeBeeTree(Generic[I]):
         node = self.get_tree_node_by_key(key)
         return node.item
 
+    def get(self, key: Point, default: I | None = None) -> I | None:
+        """
+        The item stored under key, or default if key is not in the tree.
+
+        Time Complexity:
+        - Worst case: O(D), where D is the maximum depth of the tree
+        - Best case: O(1), the key is at the root
+        """
+        try:
+            return self.get_tree_node_by_key(key).item
+        except KeyError:
+            return default
+
+    def get_many(self, keys: Iterable[Point], default: I | None = None) -> list[I | None]:
+        """
+        Items stored under each of keys, in the same order, with default for
+        missing keys. The lookups run in Morton (Z-order) of their keys so
+        that consecutive lookups walk mostly the same upper part of the tree.
+
+        Time Complexity:
+        - Worst case: O(Q * (log(Q) + D)), where Q is the number of keys and D the maximum depth of the tree
+        - Best case: O(Q * log(Q)), when every key is at the root
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        offset = min_corner(keys)
+        order = sorted(range(len(keys)), key=lambda i: morton_encode(keys[i], offset))
+        result = [default] * len(keys)
+        for i in order:
+            result[i] = self.get(keys[i], default)
+        return result
+
     def get_tree_node_by_key(self, key: Point) -> BeeNode:
-        return self.get_tree_node_by_key_aux(self.root, key)
+        """
+        Walks down from the root, working out each octant inline.
+
+        Time Complexity:
+        - Worst case: O(D), where D is the maximum depth of the tree
+        - Best case: O(1), the key to be found is the root
+        """
+        x, y, z = key
+        current = self.root
+        while current is not None:
+            node_key = current.key
+            if node_key == key:
+                if current.item is DELETED:
+                    break
+                return current
+            octant = 0
+            if x >= node_key[0]:
+                octant += 1
+            if y >= node_key[1]:
+                octant += 2
+            if z >= node_key[2]:
+                octant += 4
+            current = current.child[octant]
+        raise KeyError('Key not found: {0}'.format(key))
 
     def get_tree_node_by_key_aux(self, current, key) -> BeeNode:
         """
@@ -76,7 +483,9 @@ class ThreeDeeBeeTree(Generic[I]):
         - Worst case: O(D), where D is the maximum depth of the tree
         - Best case: O(1), the key to be found is the root
         """
-        if current.key == key:
+        if current is None or (current.key == key and current.item is DELETED):
+            raise KeyError('Key not found: {0}'.format(key))
+        elif current.key == key:
             return current
         else:
             new_node = current.get_child_for_key(key)
@@ -84,6 +493,8 @@ class ThreeDeeBeeTree(Generic[I]):
 
     def __setitem__(self, key: Point, item: I) -> None:
         self.root = self.insert_aux(self.root, key, item)
+        if self.rebalance:
+            self.rebuild_scapegoat(self.path_to(key))
 
     def insert_aux(self, current: BeeNode, key: Point, item: I) -> BeeNode:
         """
@@ -94,20 +505,25 @@ class ThreeDeeBeeTree(Generic[I]):
         - Best case: O(comp), where comp is the comparison of key, when the tree is empty or when the key existed in the tree
         """
         if current is None:  # base case: at the leaf
-            current = BeeNode(key, item=item)
+            current = self.node_type(key, item=item)
+            if self.aggregates:
+                current.aggregate = self.lift(item)
             self.length += 1
         elif current.key == key:
-            raise ValueError('Inserting duplicate item')
+            if current.item is not DELETED:
+                raise ValueError('Inserting duplicate item')
+            current.item = item  # revive the tombstone
+            current.subtree_size += 1
+            if self.aggregates:
+                current.aggregate = self.combine(current.aggregate, self.lift(item))
+            self.length += 1
+            self.tombstones -= 1
         else:
-            octant = 0
-            if key[0] >= current.key[0]:
-                octant += 1
-            if key[1] >= current.key[1]:
-                octant += 2
-            if key[2] >= current.key[2]:
-                octant += 4
-            current.child[octant] = self.insert_aux(current.child[octant], key, item)
+            octant = self.octant_for(current.key, key)
+            current.set_child(octant, self.insert_aux(current.child[octant], key, item))
             current.subtree_size += 1
+            if self.aggregates:
+                current.aggregate = self.combine(current.aggregate, self.lift(item))
         return current
 
     def is_leaf(self, current: BeeNode) -> bool:
@@ -125,6 +541,262 @@ class ThreeDeeBeeTree(Generic[I]):
                 return False  # it's not a leaf node
         return True  # If no children are present, it's a leaf node
 
+    def range_query(self, lo: Point, hi: Point) -> Iterator[tuple[Point, I]]:
+        """
+        Yields the (key, item) pairs with lo <= key <= hi on every axis.
+        Children whose octant misses the box are skipped, and subtrees whose
+        octant lies inside it are yielded without testing their keys.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of nodes, when no octant can be pruned
+        - Best case: O(D + K), where D is the depth of the tree and K the number of keys yielded
+        """
+        stack = [(self.root, UNBOUNDED)]
+        while stack:
+            current, region = stack.pop()
+            if current is None or current.subtree_size == 0:
+                continue
+            if region_inside(region, lo, hi):
+                yield from self.iter_subtree(current)
+                continue
+            key = current.key
+            if (lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]
+                    and current.item is not DELETED):
+                yield key, current.item
+            for octant in range(8):
+                if current.child[octant] is not None:
+                    child_region = octant_region(region, key, octant)
+                    if region_overlaps(child_region, lo, hi):
+                        stack.append((current.child[octant], child_region))
+
+    def lift(self, item: I) -> tuple:
+        """ The value of each aggregate over the single item. """
+        return tuple(aggregate.lift(item) for aggregate in self.aggregates.values())
+
+    def identity(self) -> tuple:
+        """ The value of each aggregate over no items. """
+        return tuple(aggregate.identity for aggregate in self.aggregates.values())
+
+    def combine(self, a: tuple, b: tuple) -> tuple:
+        return tuple(aggregate.combine(x, y) for aggregate, x, y in zip(self.aggregates.values(), a, b))
+
+    def refresh_node(self, node: BeeNode) -> None:
+        """
+        Recomputes node.aggregate from its item and the aggregates of its children.
+
+        Time Complexity:
+        - Best case = Worst case: O(A), where A is the number of aggregates
+        """
+        value = self.identity() if node.item is DELETED else self.lift(node.item)
+        for child in node.child:
+            if child is not None:
+                value = self.combine(value, child.aggregate)
+        node.aggregate = value
+
+    def refresh_subtree(self, current: BeeNode | None) -> None:
+        """
+        Recomputes the aggregates of every node under current, children first.
+
+        Time Complexity:
+        - Best case = Worst case: O(K * A), where K is the size of the subtree and A the number of aggregates
+        """
+        nodes = []
+        stack = [current]
+        while stack:
+            node = stack.pop()
+            if node is not None:
+                nodes.append(node)
+                stack.extend(node.child)
+        for node in reversed(nodes):
+            self.refresh_node(node)
+
+    def refresh_aggregates(self, key: Point) -> None:
+        """
+        Recomputes the aggregates from key up to the root. Call it after
+        changing the fields of an item stored in the tree.
+
+        Time Complexity:
+        - Worst case: O(D * A), where D is the depth of the tree and A the number of aggregates
+        - Best case: O(A), when key is at the root
+        """
+        path = self.path_to(key)
+        if not path or path[-1].key != key or path[-1].item is DELETED:
+            raise KeyError('Key not found: {0}'.format(key))
+        for node in reversed(path):
+            self.refresh_node(node)
+
+    def aggregate_in_box(self, lo: Point, hi: Point) -> dict[str, object]:
+        """
+        The value of each aggregate over the items with lo <= key <= hi on
+        every axis. A subtree whose octant lies inside the box contributes
+        its stored aggregate without being visited, as in count_in_box.
+
+        Time Complexity:
+        - Worst case: O(N * A), where N is the number of nodes and A the number of aggregates
+        - Best case: O(A), when the root's octant lies inside the box or the tree is empty
+        """
+        value = self.identity()
+        stack = [(self.root, UNBOUNDED)]
+        while stack:
+            current, region = stack.pop()
+            if current is None or current.subtree_size == 0:
+                continue
+            if region_inside(region, lo, hi):
+                value = self.combine(value, current.aggregate)
+                continue
+            key = current.key
+            if (lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]
+                    and current.item is not DELETED):
+                value = self.combine(value, self.lift(current.item))
+            for octant in range(8):
+                if current.child[octant] is not None:
+                    child_region = octant_region(region, key, octant)
+                    if region_overlaps(child_region, lo, hi):
+                        stack.append((current.child[octant], child_region))
+        return dict(zip(self.aggregates, value))
+
+    def count_in_box(self, lo: Point, hi: Point) -> int:
+        """
+        Number of keys with lo <= key <= hi on every axis. A subtree whose
+        octant lies inside the box adds its subtree_size without being visited.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of nodes, when no octant can be pruned
+        - Best case: O(1), when the root's octant lies inside the box or the tree is empty
+        """
+        count = 0
+        stack = [(self.root, UNBOUNDED)]
+        while stack:
+            current, region = stack.pop()
+            if current is None or current.subtree_size == 0:
+                continue
+            if region_inside(region, lo, hi):
+                count += current.subtree_size
+                continue
+            key = current.key
+            if (lo[0] <= key[0] <= hi[0] and lo[1] <= key[1] <= hi[1] and lo[2] <= key[2] <= hi[2]
+                    and current.item is not DELETED):
+                count += 1
+            for octant in range(8):
+                if current.child[octant] is not None:
+                    child_region = octant_region(region, key, octant)
+                    if region_overlaps(child_region, lo, hi):
+                        stack.append((current.child[octant], child_region))
+        return count
+
+    def nearest(self, point: Point, k: int = 1) -> list[tuple[Point, I]]:
+        """
+        The k (key, item) pairs closest to point, nearest first.
+
+        Subtrees are visited best first, by the distance from point to their
+        octant, from a heap of negated distances. The k best keys so far are
+        kept in a bounded MaxHeap, so the search stops as soon as the nearest
+        unvisited octant is further away than the kth best key.
+
+        Time Complexity:
+        - Worst case: O(N * log(N)), where N is the number of nodes, when no octant can be pruned
+        - Best case: O(D * log(k)), where D is the depth of the tree, for well spread keys
+        """
+        if k <= 0 or self.root is None:
+            return []
+        best = MaxHeap(k)                # (distance, seq, key, item), furthest on top
+        frontier = MaxHeap(64)           # (-distance to octant, seq, node, region)
+        seq = 0
+        frontier.add((0, seq, self.root, UNBOUNDED))
+        while len(frontier) > 0:
+            bound, _, current, region = frontier.get_max()
+            if len(best) == k and -bound > best.the_array[1][0]:
+                break
+            distance = distance_squared(current.key, point)
+            if current.item is DELETED:
+                pass
+            elif len(best) < k:
+                best.add((distance, seq, current.key, current.item))
+            elif distance < best.the_array[1][0]:
+                best.get_max()
+                best.add((distance, seq, current.key, current.item))
+            for octant in range(8):
+                child = current.child[octant]
+                if child is not None and child.subtree_size > 0:
+                    child_region = octant_region(region, current.key, octant)
+                    seq += 1
+                    if frontier.is_full():
+                        frontier.grow()
+                    frontier.add((-region_distance_squared(child_region, point), seq, child, child_region))
+
+        result = []
+        while len(best) > 0:
+            _, _, key, item = best.get_max()
+            result.append((key, item))
+        result.reverse()
+        return result
+
+    def within_radius(self, point: Point, radius: float) -> Iterator[tuple[Point, I]]:
+        """
+        Yields the (key, item) pairs whose key is within euclidean distance
+        radius of point, skipping octants which are entirely further away.
+
+        Time Complexity:
+        - Worst case: O(N), where N is the number of nodes, when no octant can be pruned
+        - Best case: O(D + K), where D is the depth of the tree and K the number of keys yielded
+        """
+        r_squared = radius * radius
+        stack = [(self.root, UNBOUNDED)]
+        while stack:
+            current, region = stack.pop()
+            if current is None or current.subtree_size == 0:
+                continue
+            if distance_squared(current.key, point) <= r_squared and current.item is not DELETED:
+                yield current.key, current.item
+            for octant in range(8):
+                child = current.child[octant]
+                if child is not None:
+                    child_region = octant_region(region, current.key, octant)
+                    if region_distance_squared(child_region, point) <= r_squared:
+                        stack.append((child, child_region))
+
+    def save(self, path: str) -> None:
+        """ Writes the tree to path in the flat layout of flat_tree. """
+        from flat_tree import save
+        save(self, path)
+
+    @staticmethod
+    def load(path: str, mmap: bool = True):
+        """ Opens a saved tree as a read-only FlatThreeDeeBeeTree, see flat_tree.load. """
+        from flat_tree import load
+        return load(path, mmap)
+
+    def iter_subtree(self, current: BeeNode | None) -> Iterator[tuple[Point, I]]:
+        """
+        Yields every (key, item) pair in the subtree rooted at current, in
+        pre-order, skipping tombstones.
+
+        Time Complexity:
+        - Best case = Worst case: O(K), where K is the size of the subtree
+        """
+        stack = [current]
+        while stack:
+            node = stack.pop()
+            if node is not None:
+                if node.item is not DELETED:
+                    yield node.key, node.item
+                stack.extend(reversed(node.child))
+
+
+def _benchmark_memory(n: int = 10 ** 6) -> None:
+    import random
+    import tracemalloc
+
+    coords = random.Random(n).sample(range(10 * n), 3 * n)
+    pairs = [((coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]), None) for i in range(n)]
+    for compact in (False, True):
+        tracemalloc.start()
+        tree = ThreeDeeBeeTree.build_balanced(pairs, compact=compact)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('{0:>14} nodes: {1:6.1f} bytes per point'.format(tree.node_type.__name__, size / n))
+        del tree
+
 
 if __name__ == "__main__":
     tdbt = ThreeDeeBeeTree()
@@ -132,4 +804,5 @@ if __name__ == "__main__":
     tdbt[(1, 5, 2)] = "B"
     tdbt[(4, 3, 1)] = "C"
     tdbt[(5, 4, 0)] = "D"
-    print(tdbt.root.get_child_for_key((4, 3, 1)).subtree_size)  # 2
\ No newline at end of file
+    print(tdbt.root.get_child_for_key((4, 3, 1)).subtree_size)  # 2
+    _benchmark_memory()